@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Rect normalization stats: paragraph highlights stored as raw selection rects
+(one per glyph run, plus slivers) against normalize_rects() output. Reports
+rect count, serialized size, draw time and hit-test time.
+
+    python3 benchmarks/bench_normalize_rects.py [--annotations N] [--lines L] [--repeat R]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import cairo
+
+from pdf_app.document.painter import AnnotationPainter
+from pdf_app.document.store import Annotation, AnnotationStore
+from pdf_app.utils.geometry import normalize_rects
+
+PAGE_W, PAGE_H = 612, 792
+LINE_H = 12
+
+def selection_rects(rng, lines):
+    """What a glyph-level selection over `lines` lines of text looks like."""
+    rects = []
+    top = rng.uniform(40, PAGE_H - 40 - lines * (LINE_H + 2))
+    for line in range(lines):
+        y = top + line * (LINE_H + 2)
+        x = 72.0
+        while x < PAGE_W - 90:
+            for _ in range(rng.randint(2, 9)):  # glyph runs of one word
+                w = rng.uniform(3, 7)
+                jitter = rng.uniform(-0.4, 0.4)
+                rects.append((x, y + jitter, w, LINE_H - jitter))
+                x += w
+            rects.append((x, y, 0.0, LINE_H))  # zero-width sliver at the space
+            x += rng.uniform(2.5, 4)
+    return rects
+
+def make_annotations(n, lines, normalize):
+    rng = random.Random(7)
+    anns = []
+    for _ in range(n):
+        rects = selection_rects(rng, lines)
+        anns.append(Annotation.create('highlight', 0, normalize_rects(rects) if normalize else rects))
+    return anns
+
+def bench_draw(annotations, repeat):
+    painter = AnnotationPainter()
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(PAGE_W * 1.5), int(PAGE_H * 1.5))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        c = cairo.Context(surface)
+        c.scale(1.5, 1.5)
+        painter.paint(c, annotations)
+    surface.flush()
+    return (time.perf_counter() - start) / repeat
+
+def bench_hit_test(annotations, repeat):
+    store = AnnotationStore()
+    store.annotations = annotations
+    rng = random.Random(3)
+    points = [(rng.uniform(0, PAGE_W), rng.uniform(0, PAGE_H)) for _ in range(repeat)]
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull  # find_annotation_at logs every call
+    try:
+        start = time.perf_counter()
+        for x, y in points:
+            store.find_annotation_at(0, x, y)
+        return (time.perf_counter() - start) / repeat
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--annotations", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=8, help="lines per highlight")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    raw = make_annotations(args.annotations, args.lines, normalize=False)
+    start = time.perf_counter()
+    for ann in raw:
+        normalize_rects(ann.rects)
+    normalize_time = (time.perf_counter() - start) / len(raw)
+
+    print(f"{args.annotations} paragraph highlights of {args.lines} lines on one page")
+    print(f"normalize_rects: {normalize_time * 1000:.3f} ms per annotation")
+    for name, anns in (("raw", raw), ("normalized", make_annotations(args.annotations, args.lines, normalize=True))):
+        n_rects = sum(len(a.rects) for a in anns)
+        size = len(json.dumps([asdict(a) for a in anns]))
+        draw = bench_draw(anns, args.repeat)
+        hit = bench_hit_test(anns, args.repeat)
+        print(f"{name:10s} {n_rects:7d} rects  {size / 1024:8.1f} KiB JSON  "
+              f"draw {draw * 1000:7.2f} ms/frame  hit-test {hit * 1000:6.3f} ms")
+
+if __name__ == '__main__':
+    main()
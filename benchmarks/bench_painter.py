@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmarks annotation painting: the shared AnnotationPainter against the old
+per-rect / per-note painting, on an image surface (view path) and a PDF
+surface (export path).
+
+    python3 benchmarks/bench_painter.py [--annotations N] [--repeat R]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import cairo
+import gi
+gi.require_version('Pango', '1.0')
+gi.require_version('PangoCairo', '1.0')
+from gi.repository import Pango, PangoCairo
+
+from pdf_app.document.painter import AnnotationPainter
+from pdf_app.document.store import Annotation
+
+PAGE_W, PAGE_H = 612, 792
+COLORS = [(1, 1, 0, 0.4), (0.5, 1, 0.5, 0.4), (1, 0, 0, 1)]
+
+def make_annotations(n):
+    rng = random.Random(42)
+    anns = []
+    for i in range(n):
+        kind = rng.choice(['highlight', 'highlight', 'underline', 'text'])
+        y = rng.uniform(0, PAGE_H - 40)
+        rects = [(rng.uniform(0, 300), y + line * 14, rng.uniform(50, 300), 12)
+                 for line in range(rng.randint(1, 3))]
+        ann = Annotation.create(kind, 0, rects, color=rng.choice(COLORS))
+        if kind == 'text':
+            ann.content = f"Note {i}"
+        anns.append(ann)
+    return anns
+
+def legacy_paint(c, annotations):
+    """The painting loop the view/exporter used before the shared painter."""
+    for ann in annotations:
+        r, g, b, a = ann.color
+        c.set_source_rgba(r, g, b, a)
+        if ann.type == 'highlight':
+            for x, y, w, h in ann.rects:
+                c.rectangle(x, y, w, h)
+                c.fill()
+        elif ann.type == 'underline':
+            c.set_line_width(1.0)
+            for x, y, w, h in ann.rects:
+                c.move_to(x, y + h)
+                c.line_to(x + w, y + h)
+                c.stroke()
+        elif ann.type == 'text' and ann.rects:
+            x, y, w, h = ann.rects[0]
+            layout = PangoCairo.create_layout(c)
+            layout.set_text(ann.content, -1)
+            layout.set_font_description(Pango.FontDescription("Sans 12"))
+            c.move_to(x, y)
+            PangoCairo.show_layout(c, layout)
+
+def bench_view(paint, annotations, repeat):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(PAGE_W * 1.5), int(PAGE_H * 1.5))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        c = cairo.Context(surface)
+        c.scale(1.5, 1.5)
+        paint(c, annotations)
+    surface.flush()
+    return (time.perf_counter() - start) / repeat
+
+def bench_export(paint, annotations, repeat):
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        surface = cairo.PDFSurface(path, PAGE_W, PAGE_H)
+        c = cairo.Context(surface)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            paint(c, annotations)
+            surface.show_page()
+        surface.finish()
+        elapsed = (time.perf_counter() - start) / repeat
+        return elapsed, os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--annotations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    annotations = make_annotations(args.annotations)
+    painter = AnnotationPainter()
+    candidates = [("legacy", legacy_paint), ("painter", painter.paint)]
+
+    print(f"{args.annotations} annotations on one page, {args.repeat} repeats")
+    for name, paint in candidates:
+        view = bench_view(paint, annotations, args.repeat)
+        export, size = bench_export(paint, annotations, args.repeat)
+        print(f"{name:8s} view {view * 1000:8.2f} ms/frame   export {export * 1000:8.2f} ms/page  "
+              f"({size / args.repeat / 1024:.1f} KiB/page)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmarks drag-selection latency per motion event: Poppler's
+Page.get_selected_region (re-extracts the page text every call) against the
+cached PageTextLayout. Drags diagonally across the densest pages of a PDF.
+
+    python3 benchmarks/bench_text_selection.py FILE.pdf [--events N] [--pages P]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import gi
+gi.require_version('Poppler', '0.18')
+from gi.repository import GLib, Poppler
+
+from pdf_app.document.text_layout import PageTextLayout
+
+SCALE = 1.5
+
+def drag_points(page, events):
+    # Start near the top-left, move to the bottom-right like a selection drag
+    w, h = page.get_size()
+    sx, sy = w * 0.1, h * 0.1
+    return [(sx, sy, sx + (w * 0.8) * i / events, sy + (h * 0.8) * i / events)
+            for i in range(1, events + 1)]
+
+def poppler_select(page, x1, y1, x2, y2):
+    rect = Poppler.Rectangle()
+    rect.x1, rect.y1, rect.x2, rect.y2 = x1, y1, x2, y2
+    return page.get_selected_region(SCALE, Poppler.SelectionStyle.GLYPH, rect)
+
+def timed(select, points):
+    samples = []
+    for x1, y1, x2, y2 in points:
+        start = time.perf_counter()
+        select(x1, y1, x2, y2)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {name:8s} mean {statistics.mean(samples) * 1000:7.3f} ms   "
+          f"p95 {p95 * 1000:7.3f} ms   max {samples[-1] * 1000:7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--events", type=int, default=200, help="motion events per page")
+    parser.add_argument("--pages", type=int, default=3, help="number of densest pages to test")
+    args = parser.parse_args()
+
+    uri = GLib.filename_to_uri(os.path.abspath(args.pdf), None)
+    doc = Poppler.Document.new_from_file(uri, None)
+    pages = [doc.get_page(i) for i in range(doc.get_n_pages())]
+    pages.sort(key=lambda p: len(p.get_text() or ""), reverse=True)
+
+    for page in pages[:args.pages]:
+        points = drag_points(page, args.events)
+        start = time.perf_counter()
+        layout = PageTextLayout.from_page(page)
+        build = time.perf_counter() - start
+
+        print(f"page {page.get_index() + 1}: {len(layout)} glyphs, {len(layout.lines)} lines, "
+              f"layout built once in {build * 1000:.1f} ms")
+        report("poppler", timed(lambda *r: poppler_select(page, *r), points))
+        report("cached", timed(lambda *r: layout.selected_region(*r, scale=SCALE), points))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+# Command line (python -m pdf_app). Headless commands need no display:
+#
+#   python -m pdf_app flatten [-j N] [-o DIR] [--pages 1-5,9] [--annotated-only] PDF[=PROJECT] ...
+#   python -m pdf_app merge -o OUT.pdf [--annotated-only] PDF[=PROJECT] ...
+#   python -m pdf_app digest [-o OUT.md|OUT.csv] [--format markdown|csv] [--pages 1-5] PDF[=PROJECT]
+#   python -m pdf_app images [-o DIR] [--dpi 300] [--format png|tiff] [--pages 1-5] [--all-pages] PDF[=PROJECT]
+#   python -m pdf_app convert [--binary|--json] SRC DST
+#
+# Without a subcommand the GTK application starts. Worker functions live here,
+# not in __main__, so spawned pool workers can import them.
+
+def open_store(pdf_path: str, project_path=None):
+    """
+    Annotations for pdf_path: PROJECT if given, else its database or JSON
+    sidecar. Raises if they can't be read, so a corrupt sidecar fails the
+    document instead of exporting it unannotated.
+    """
+    from pdf_app.document.store import AnnotationStore
+    from pdf_app.document.sqlite_store import SQLiteAnnotationStore
+
+    if project_path:
+        store = AnnotationStore()
+        store.read_project(project_path, lazy=True)
+    elif SQLiteAnnotationStore.exists_for(pdf_path):
+        store = SQLiteAnnotationStore()
+        store.load(pdf_path, lazy=True, strict=True)
+    else:
+        store = AnnotationStore()
+        store.load(pdf_path, lazy=True, strict=True)
+    return store
+
+def _split_input(arg: str):
+    pdf_path, _, project_path = arg.partition('=')
+    return pdf_path, project_path or None
+
+def _output_path(pdf_path: str, output_dir, suffix: str) -> str:
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(pdf_path)), stem + suffix + ".pdf")
+
+def _check_outputs(tasks) -> list:
+    """Messages for outputs that would overwrite each other or an input."""
+    inputs = {os.path.normcase(os.path.abspath(task[0])) for task in tasks}
+    by_output = {}
+    for task in tasks:
+        by_output.setdefault(os.path.normcase(os.path.abspath(task[2])), []).append(task[0])
+    problems = []
+    for output, pdfs in by_output.items():
+        if len(pdfs) > 1:
+            problems.append(f"{', '.join(pdfs)} would all be written to {output}")
+        if output in inputs:
+            problems.append(f"{pdfs[0]}: output {output} would overwrite an input")
+    return problems
+
+def _flatten_one(task):
+    """Worker: flattens one PDF. Returns (pdf, output, status, seconds, pages, error); status is OK/SKIP/FAIL."""
+    pdf_path, project_path, output_path, page_spec, annotated_only, verbose = task
+
+    pages = [0]
+    def progress(done, total):
+        pages[0] = total
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        # The store and exporter are chatty; keep worker output unless --verbose
+        with contextlib.redirect_stdout(sys.stdout if verbose else log):
+            from pdf_app.document.export import count_pages, export_flattened_pdf, select_pages
+            store = open_store(pdf_path, project_path)
+            # The range is resolved against each document's page count
+            if not select_pages(store, count_pages(pdf_path), page_spec, annotated_only):
+                reason = "no annotated pages" if annotated_only else "no pages in range"
+                return pdf_path, output_path, "SKIP", time.perf_counter() - start, 0, reason
+            ok = export_flattened_pdf(pdf_path, store, output_path, progress,
+                                      pages=page_spec, annotated_only=annotated_only)
+        error = None if ok else (log.getvalue().strip().splitlines() or ["export failed"])[-1]
+    except Exception as e:
+        ok, error = False, str(e)
+    return pdf_path, output_path, "OK" if ok else "FAIL", time.perf_counter() - start, pages[0], error
+
+def cmd_flatten(args) -> int:
+    if args.pages:
+        from pdf_app.document.export import parse_page_range
+        try:
+            parse_page_range(args.pages, 0) # Syntax check; resolved per document later
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 2
+
+    tasks = []
+    for arg in args.inputs:
+        pdf_path, project_path = _split_input(arg)
+        tasks.append((pdf_path, project_path, _output_path(pdf_path, args.output_dir, args.suffix),
+                      args.pages, args.annotated_only, args.verbose))
+    problems = _check_outputs(tasks)
+    if problems:
+        for problem in problems:
+            print(f"Error: {problem}")
+        print("Rename the inputs, or flatten them into different -o directories in separate runs")
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = max(1, min(args.jobs or os.cpu_count() or 1, len(tasks)))
+    print(f"Flattening {len(tasks)} documents with {workers} workers")
+
+    failed = 0
+    skipped = 0
+    total_pages = 0
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, maxtasksperchild=args.max_tasks_per_worker) as pool:
+        # Unordered: report each document as soon as it finishes
+        for pdf_path, output_path, status, seconds, pages, error in pool.imap_unordered(_flatten_one, tasks):
+            if status == "OK":
+                total_pages += pages
+                rate = pages / seconds if seconds > 0 else 0.0
+                print(f"OK    {pdf_path} -> {output_path}  {pages} pages in {seconds:.2f}s ({rate:.1f} pages/s)")
+            elif status == "SKIP":
+                skipped += 1
+                print(f"SKIP  {pdf_path}: {error}")
+            else:
+                failed += 1
+                print(f"FAIL  {pdf_path}: {error}")
+
+    elapsed = time.perf_counter() - start
+    done = len(tasks) - failed - skipped
+    print(f"Done: {done}/{len(tasks)} documents ({skipped} skipped), {total_pages} pages in {elapsed:.2f}s "
+          f"({done / elapsed if elapsed else 0:.2f} docs/s, {total_pages / elapsed if elapsed else 0:.1f} pages/s)")
+    return 1 if failed else 0
+
+def cmd_merge(args) -> int:
+    from pdf_app.document.export import export_merged_pdf
+
+    sources = []
+    for arg in args.inputs:
+        pdf_path, project_path = _split_input(arg)
+        # Stores load when their document is reached, one at a time
+        sources.append((pdf_path, lambda pdf=pdf_path, project=project_path: open_store(pdf, project)))
+
+    start = time.perf_counter()
+    out = sys.stdout
+    def progress(done, total):
+        print(f"[{done}/{total}] {sources[done - 1][0]}  ({time.perf_counter() - start:.2f}s)", file=out)
+
+    # The store and exporter are chatty; only progress is shown unless --verbose
+    log = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+        ok = export_merged_pdf(sources, args.output, progress, annotated_only=args.annotated_only)
+    elapsed = time.perf_counter() - start
+    if not ok:
+        error = (log.getvalue().strip().splitlines() or ["merge failed"])[-1]
+        print(f"FAIL  merge into {args.output}: {error}")
+        return 1
+    print(f"Merged {len(sources)} documents into {args.output} in {elapsed:.2f}s")
+    return 0
+
+def cmd_digest(args) -> int:
+    from pdf_app.document.digest import export_digest, format_for_path
+
+    pdf_path, project_path = _split_input(args.input)
+    fmt = args.format or (format_for_path(args.output) if args.output else "markdown")
+    output_path = args.output or os.path.splitext(pdf_path)[0] + ("_highlights.csv" if fmt == "csv" else "_highlights.md")
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            store = open_store(pdf_path, project_path)
+            ok = export_digest(pdf_path, store, output_path, pages=args.pages, fmt=fmt)
+    except Exception as e:
+        print(f"FAIL  {pdf_path}: {e}")
+        return 1
+    if not ok:
+        error = (log.getvalue().strip().splitlines() or ["digest failed"])[-1]
+        print(f"FAIL  {pdf_path}: {error}")
+        return 1
+    print(f"OK    {pdf_path} -> {output_path} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+def cmd_images(args) -> int:
+    pdf_path, project_path = _split_input(args.input)
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    output_dir = args.output_dir or os.path.join(os.path.dirname(os.path.abspath(pdf_path)), stem + "_pages")
+    tiff_path = os.path.join(output_dir, stem + ".tiff") if args.format == "tiff" else None
+
+    start = time.perf_counter()
+    out = sys.stdout
+    rendered = [0]
+    def progress(done, total):
+        rendered[0] = done
+        print(f"[{done}/{total}] pages  ({time.perf_counter() - start:.2f}s)", file=out)
+
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            from pdf_app.document.raster_export import export_page_images
+            store = open_store(pdf_path, project_path)
+            paths = export_page_images(pdf_path, store, output_dir, dpi=args.dpi, pages=args.pages,
+                                       annotated_only=not args.all_pages, tiff_path=tiff_path,
+                                       keep_pngs=tiff_path is None, workers=args.jobs, progress=progress)
+    except Exception as e:
+        print(f"FAIL  {pdf_path}: {e}")
+        return 1
+    if not paths:
+        print(f"SKIP  {pdf_path}: no pages to export")
+        return 0
+    print(f"OK    {pdf_path} -> {tiff_path or output_dir}  {rendered[0]} pages at {args.dpi} DPI "
+          f"in {time.perf_counter() - start:.2f}s")
+    return 0
+
+def cmd_convert(args) -> int:
+    from pdf_app.document.binary_format import convert_project
+    convert_project(args.src, args.dst, args.binary)
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m pdf_app",
+                                     description="PDF Workspace. Without a command, starts the GUI.")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("flatten", help="Flatten annotations into PDFs (headless, parallel)")
+    p.add_argument("inputs", nargs="+", metavar="PDF[=PROJECT]",
+                   help="PDF, optionally with its project file; default is the PDF's sidecar/database")
+    p.add_argument("-o", "--output-dir", help="Output directory (default: next to each PDF)")
+    p.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPU count)")
+    p.add_argument("--suffix", default="_flattened", help="Output file name suffix (default: _flattened)")
+    p.add_argument("--pages", metavar="RANGE", help="Only these pages, 1-based, e.g. 1-5,9,20-")
+    p.add_argument("--annotated-only", action="store_true", help="Only pages with annotations")
+    p.add_argument("--max-tasks-per-worker", type=int, default=50,
+                   help="Recycle workers after N documents to bound memory (default: 50)")
+    p.add_argument("-v", "--verbose", action="store_true", help="Show worker debug output")
+    p.set_defaults(func=cmd_flatten)
+
+    p = sub.add_parser("merge", help="Flatten several PDFs into one output PDF, in order")
+    p.add_argument("inputs", nargs="+", metavar="PDF[=PROJECT]")
+    p.add_argument("-o", "--output", required=True, help="Output PDF")
+    p.add_argument("--annotated-only", action="store_true", help="Only pages with annotations")
+    p.add_argument("-v", "--verbose", action="store_true", help="Show debug output")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("digest", help="Extract highlighted text and notes to Markdown or CSV")
+    p.add_argument("input", metavar="PDF[=PROJECT]")
+    p.add_argument("-o", "--output", help="Output file (default: <pdf>_highlights.md / .csv)")
+    p.add_argument("--format", choices=["markdown", "csv"], help="Default: from the output extension")
+    p.add_argument("--pages", metavar="RANGE", help="Only these pages, 1-based, e.g. 1-5,9,20-")
+    p.add_argument("-v", "--verbose", action="store_true", help="Show debug output")
+    p.set_defaults(func=cmd_digest)
+
+    p = sub.add_parser("images", help="Rasterize pages to PNG files or one multi-page TIFF (parallel)")
+    p.add_argument("input", metavar="PDF[=PROJECT]")
+    p.add_argument("-o", "--output-dir", help="Output directory (default: <pdf>_pages next to the PDF)")
+    p.add_argument("--dpi", type=int, default=150, help="Resolution (default: 150)")
+    p.add_argument("--format", choices=["png", "tiff"], default="png",
+                   help="png: one file per page; tiff: one multi-page TIFF (needs Pillow)")
+    p.add_argument("--pages", metavar="RANGE", help="Only these pages, 1-based, e.g. 1-5,9,20-")
+    p.add_argument("--all-pages", action="store_true", help="Include pages without annotations")
+    p.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPU count)")
+    p.add_argument("-v", "--verbose", action="store_true", help="Show debug output")
+    p.set_defaults(func=cmd_images)
+
+    p = sub.add_parser("convert", help="Convert a project between JSON and binary")
+    p.add_argument("src")
+    p.add_argument("dst")
+    fmt = p.add_mutually_exclusive_group()
+    fmt.add_argument("--binary", dest="binary", action="store_const", const=True)
+    fmt.add_argument("--json", dest="binary", action="store_const", const=False)
+    p.set_defaults(func=cmd_convert)
+
+    return parser
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        from pdf_app.main import main as gui_main
+        return gui_main()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,217 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Compact binary project format (little-endian):
+#
+#   header        MAGIC, version, flags, n_strings, n_annotations, n_rects,
+#                 n_pages, fingerprint string index
+#   string table  (n_strings + 1) u32 offsets, then the UTF-8 blob
+#                 (padded to 8 bytes)
+#   records       n_annotations fixed-width records, sorted by page:
+#                 page, id/type/content/style/created_at string indices,
+#                 first rect, rect count, RGBA color (f64)
+#   rects         n_rects * (x, y, w, h) f64
+#   page table    n_pages * (page, first record, record count)
+#
+# Annotations keep their relative order within a page.
+
+MAGIC = b"PDFANNB1"
+VERSION = 1
+BINARY_EXTENSION = ".pdfannot"
+
+HEADER = struct.Struct('<8sHHIIIII')
+RECORD = struct.Struct('<iIIIIIII4d')
+PAGE_ENTRY = struct.Struct('<iII')
+_U32 = struct.Struct('<I')
+_U32_PAIR = struct.Struct('<II')
+
+def is_binary_path(path: str) -> bool:
+    """Binary is chosen by extension when saving."""
+    return path.lower().endswith(BINARY_EXTENSION)
+
+def is_binary_file(path: str) -> bool:
+    """Binary is detected by magic bytes when loading."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def _le_doubles(values) -> bytes:
+    arr = array('d', values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+def _le_uints(values) -> bytes:
+    arr = array('I', values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+def write_project(path: str, annotations, fingerprint: str):
+    """Writes annotations (Annotation objects) as a binary project."""
+    strings: List[bytes] = []
+    string_index: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        idx = string_index.get(value)
+        if idx is None:
+            idx = len(strings)
+            string_index[value] = idx
+            strings.append(value.encode('utf-8'))
+        return idx
+
+    fingerprint_idx = intern(fingerprint or "")
+
+    # Stable sort keeps the draw order within each page
+    ordered = sorted(annotations, key=lambda a: a.page_index)
+
+    records = bytearray()
+    rect_values: List[float] = []
+    pages: List[Tuple[int, int, int]] = []
+    n_rects = 0
+    for i, ann in enumerate(ordered):
+        if not pages or pages[-1][0] != ann.page_index:
+            pages.append((ann.page_index, i, 0))
+        page, first, count = pages[-1]
+        pages[-1] = (page, first, count + 1)
+
+        rects = ann.rects or []
+        for r in rects:
+            rect_values.extend(r)
+        r, g, b, a = ann.color
+        records += RECORD.pack(
+            ann.page_index,
+            intern(ann.id), intern(ann.type), intern(ann.content or ""),
+            intern(ann.style or ""), intern(ann.created_at or ""),
+            n_rects, len(rects),
+            r, g, b, a
+        )
+        n_rects += len(rects)
+
+    offsets = [0]
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    blob = b"".join(strings)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(strings), len(ordered),
+                            n_rects, len(pages), fingerprint_idx))
+        f.write(_le_uints(offsets))
+        f.write(blob)
+        f.write(b"\0" * _pad8(HEADER.size + 4 * len(offsets) + len(blob)))
+        f.write(records)
+        f.write(_le_doubles(rect_values))
+        for entry in pages:
+            f.write(PAGE_ENTRY.pack(*entry))
+    os.replace(tmp_path, path)
+
+class BinaryProject:
+    """
+    View over a binary project file. Only the header and page table are read
+    up front; records, rects and strings are decoded from the buffer on
+    request, so with open() (mmap) a page load only touches that page's bytes.
+    """
+
+    def __init__(self, data):
+        (magic, version, _flags, n_strings, self.n_annotations,
+         n_rects, n_pages, fingerprint_idx) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a binary annotation project")
+        if version > VERSION:
+            raise ValueError(f"Unsupported binary project version {version}")
+
+        self._data = data
+        pos = HEADER.size
+
+        self._offsets_start = pos
+        pos += 4 * (n_strings + 1)
+        self._blob_start = pos
+        pos += _U32.unpack_from(data, pos - 4)[0]  # Last offset = blob size
+        pos += _pad8(pos)
+        self._strings: Dict[int, str] = {}
+
+        self._records_start = pos
+        pos += RECORD.size * self.n_annotations
+        self._rects_start = pos
+        pos += 32 * n_rects
+
+        # page -> (first record, record count)
+        self.pages: Dict[int, Tuple[int, int]] = {}
+        for _ in range(n_pages):
+            page, first, count = PAGE_ENTRY.unpack_from(data, pos)
+            self.pages[page] = (first, count)
+            pos += PAGE_ENTRY.size
+
+        self.fingerprint = self._string(fingerprint_idx)
+
+    @classmethod
+    def open(cls, path: str) -> 'BinaryProject':
+        """Maps the file read-only; the mapping outlives the file handle."""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, idx: int) -> str:
+        s = self._strings.get(idx)
+        if s is None:
+            start, end = _U32_PAIR.unpack_from(self._data, self._offsets_start + 4 * idx)
+            s = self._data[self._blob_start + start:self._blob_start + end].decode('utf-8')
+            self._strings[idx] = s
+        return s
+
+    def read_records(self, first: int, count: int) -> list:
+        """Decodes `count` Annotation records starting at record `first`."""
+        from pdf_app.document.store import Annotation
+
+        result = []
+        data = self._data
+        pos = self._records_start + RECORD.size * first
+        for _ in range(count):
+            (page, id_idx, type_idx, content_idx, style_idx, created_idx,
+             rect_start, rect_count, r, g, b, a) = RECORD.unpack_from(data, pos)
+            pos += RECORD.size
+            flat = struct.unpack_from(f'<{4 * rect_count}d', data, self._rects_start + 32 * rect_start)
+            result.append(Annotation(
+                id=self._string(id_idx),
+                type=self._string(type_idx),
+                page_index=page,
+                rects=[flat[k:k + 4] for k in range(0, len(flat), 4)],
+                color=(r, g, b, a),
+                content=self._string(content_idx),
+                style=self._string(style_idx),
+                created_at=self._string(created_idx),
+            ))
+        return result
+
+    def read_all(self) -> list:
+        return self.read_records(0, self.n_annotations)
+
+def convert_project(src_path: str, dst_path: str, binary: Optional[bool] = None):
+    """
+    Converts a project (or sidecar) between JSON and binary. The format follows
+    dst's extension unless `binary` is given (e.g. for a binary <pdf>.json sidecar).
+    """
+    from pdf_app.document.store import AnnotationStore
+
+    store = AnnotationStore()
+    fingerprint = store.read_project(src_path)
+    store.write_project(dst_path, fingerprint, binary)
+    print(f"Converted {len(store.annotations)} annotations: {src_path} -> {dst_path}")
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if a not in ('--binary', '--json')]
+    if len(args) != 2:
+        print("Usage: python -m pdf_app.document.binary_format [--binary|--json] SRC DST")
+        print(f"Without a flag, DST ending in {BINARY_EXTENSION} is written as binary, anything else as JSON.")
+        sys.exit(2)
+    binary = True if '--binary' in sys.argv else False if '--json' in sys.argv else None
+    convert_project(args[0], args[1], binary)
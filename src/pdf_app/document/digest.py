@@ -0,0 +1,118 @@
+import csv
+import os
+from typing import Optional
+
+import gi
+gi.require_version('Poppler', '0.18')
+from gi.repository import GLib, Poppler
+
+from pdf_app.document.export import select_pages
+
+# Highlight digest: the text under every highlight/underline (plus notes),
+# page by page, as Markdown or CSV. Rows are written as each page is read, so
+# memory doesn't grow with the project; only one page's annotations are held.
+
+FORMATS = ("markdown", "csv")
+CSV_COLUMNS = ["page", "type", "color", "text", "note"]
+
+# Highlight rects come from line boxes that touch the lines above and below;
+# shrink them vertically so get_text_for_area doesn't pick up neighbours
+LINE_INSET = 0.25
+
+def format_for_path(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "markdown"
+
+def color_hex(color) -> str:
+    r, g, b = (max(0, min(255, round(v * 255))) for v in color[:3])
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def text_under(page, rects) -> str:
+    """Text of the PDF text layer under `rects` (PDF points, top-left origin), in rect order."""
+    parts = []
+    for x, y, w, h in rects:
+        area = Poppler.Rectangle()
+        inset = h * LINE_INSET
+        area.x1, area.y1 = x, y + inset
+        area.x2, area.y2 = x + w, y + h - inset
+        text = page.get_text_for_area(area)
+        if text:
+            parts.append(text)
+    return " ".join(" ".join(parts).split())
+
+class _MarkdownWriter:
+    def __init__(self, f, title: str):
+        self.f = f
+        f.write(f"# Highlights: {title}\n")
+
+    def page(self, page_index: int):
+        self.f.write(f"\n## Page {page_index + 1}\n\n")
+
+    def row(self, page_index, kind, color, text, note):
+        if text:
+            quoted = text.replace("\n", " ")
+            self.f.write(f"- **{kind.capitalize()}** ({color}): “{quoted}”\n")
+            if note:
+                self.f.write(f"  - Note: {note}\n")
+        else:
+            self.f.write(f"- **Note** ({color}): {note}\n")
+
+class _CsvWriter:
+    def __init__(self, f, title: str):
+        self.writer = csv.writer(f)
+        self.writer.writerow(CSV_COLUMNS)
+
+    def page(self, page_index: int):
+        pass
+
+    def row(self, page_index, kind, color, text, note):
+        self.writer.writerow([page_index + 1, kind, color, text, note])
+
+def export_digest(pdf_path, annotation_store, output_path, progress=None, cancel=None,
+                  pages=None, fmt: Optional[str] = None) -> bool:
+    """
+    Writes the digest of `annotation_store` (a snapshot when called from the UI)
+    to output_path. fmt is "markdown" or "csv"; by default it follows the file
+    extension. pages / progress / cancel as in export_flattened_pdf; only pages
+    with annotations are visited. Opens its own Poppler document.
+    """
+    fmt = fmt or format_for_path(output_path)
+    if fmt not in FORMATS:
+        print(f"Unknown digest format: {fmt}")
+        return False
+    try:
+        uri = GLib.filename_to_uri(os.path.abspath(pdf_path), None)
+        document = Poppler.Document.new_from_file(uri, None)
+        page_indices = select_pages(annotation_store, document.get_n_pages(), pages, annotated_only=True)
+
+        rows = 0
+        with open(output_path, 'w', newline='' if fmt == "csv" else None, encoding='utf-8') as f:
+            writer_cls = _CsvWriter if fmt == "csv" else _MarkdownWriter
+            writer = writer_cls(f, os.path.basename(pdf_path))
+            for done, i in enumerate(page_indices):
+                if cancel is not None and cancel.is_set():
+                    break
+                anns = [a for a in annotation_store.get_for_page(i) if a.rects]
+                # Reading order: top to bottom, then left to right
+                anns.sort(key=lambda a: (a.rects[0][1], a.rects[0][0]))
+                if anns:
+                    page = document.get_page(i)
+                    writer.page(i)
+                    for ann in anns:
+                        text = text_under(page, ann.rects) if ann.type in ('highlight', 'underline') else ""
+                        if not text and not ann.content:
+                            continue
+                        writer.row(i, ann.type, color_hex(ann.color), text, ann.content)
+                        rows += 1
+                if progress:
+                    progress(done + 1, len(page_indices))
+
+        if cancel is not None and cancel.is_set():
+            os.remove(output_path)
+            print("Digest export cancelled")
+            return False
+        print(f"Wrote {rows} entries from {len(page_indices)} pages to {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"Error exporting digest: {e}")
+        return False
@@ -1,28 +1,78 @@
 
+import os
 import cairo
 import gi
 gi.require_version('Poppler', '0.18')
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Poppler, Pango, PangoCairo
+from gi.repository import GLib, Poppler
 
-def export_flattened_pdf(original_pdf_path, annotation_store, output_path):
+from pdf_app.document.painter import AnnotationPainter
+
+def parse_page_range(spec, n_pages):
+    """
+    "1-3,7,10-" (1-based, inclusive, open ends allowed) -> sorted 0-based
+    indices within the document. Raises ValueError for malformed input.
+    """
+    pages = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, dash, end = part.partition("-")
+        first = int(start) if start else 1
+        last = int(end) if end else (n_pages if dash else first)
+        if first < 1 or (end and last < first):
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(first - 1, min(last, n_pages)))
+    return sorted(pages)
+
+def select_pages(annotation_store, n_pages, pages=None, annotated_only=False):
+    """
+    Pages to export: `pages` (0-based list, or a range string for
+    parse_page_range) or all of them, optionally narrowed to
+    pages that have annotations. Uses the store's page index, so nothing
+    outside the selection is read.
+    """
+    if isinstance(pages, str):
+        pages = parse_page_range(pages, n_pages)
+    selected = range(n_pages) if pages is None else pages
+    if annotated_only:
+        annotated = set(annotation_store.page_indices)
+        selected = [i for i in selected if i in annotated]
+    return [i for i in selected if 0 <= i < n_pages]
+
+def count_pages(pdf_path) -> int:
+    return Poppler.Document.new_from_file(_to_uri(pdf_path), None).get_n_pages()
+
+def export_flattened_pdf(original_pdf_path, annotation_store, output_path,
+                         progress=None, cancel=None, pages=None, annotated_only=False):
+    """
+    annotation_store: anything with get_for_page()/page_indices, ideally store.snapshot().
+    pages (0-based) / annotated_only restrict the output to those pages.
+    progress(done, total) is called after each page; setting the `cancel`
+    threading.Event stops the export and removes the partial file.
+    Opens its own Poppler document, so it can run off the main thread.
+    """
     try:
          # 1. Open Original PDF
         # Poppler.Document.new_from_file expects URI
-        if not original_pdf_path.startswith("file://"):
-            uri = f"file://{original_pdf_path}"
-        else:
-            uri = original_pdf_path
-            
-        document = Poppler.Document.new_from_file(uri, None)
+        document = Poppler.Document.new_from_file(_to_uri(original_pdf_path), None)
         n_pages = document.get_n_pages()
+        page_indices = select_pages(annotation_store, n_pages, pages, annotated_only)
+        if not page_indices:
+            print("Nothing to export: no pages selected")
+            return False
         
         # 2. Create Surface - Dummy size initially
         surface = cairo.PDFSurface(output_path, 595, 842) # A4
         context = cairo.Context(surface)
+        painter = AnnotationPainter()
         
-        for i in range(n_pages):
+        for done, i in enumerate(page_indices):
+            if cancel is not None and cancel.is_set():
+                surface.finish()
+                os.remove(output_path)
+                print(f"Export cancelled after {done} of {len(page_indices)} pages")
+                return False
+
             page = document.get_page(i)
             w, h = page.get_size()
             
@@ -41,9 +91,11 @@ def export_flattened_pdf(original_pdf_path, annotation_store, output_path):
             page_anns = annotation_store.get_for_page(i)
             
             if page_anns:
-                draw_annotations(context, page_anns)
+                draw_annotations(context, page_anns, painter)
                 
             surface.show_page()
+            if progress:
+                progress(done + 1, len(page_indices))
             
         surface.finish()
         print(f"Exported PDF to {output_path}")
@@ -55,36 +107,161 @@ def export_flattened_pdf(original_pdf_path, annotation_store, output_path):
         traceback.print_exc()
         return False
 
-def draw_annotations(c, annotations):
-    for ann in annotations:
-        r, g, b, a = ann.color
-        c.set_source_rgba(r, g, b, a)
-        
+def export_merged_pdf(sources, output_path, progress=None, cancel=None, annotated_only=False):
+    """
+    Flattens several documents into one PDF, in order. `sources` is a sequence
+    of (pdf_path, store) pairs, where store may also be a zero-argument callable
+    returning the store, so annotations are loaded only when that document is
+    reached. Only one source document (and store) is alive at a time, so memory
+    stays flat however many inputs there are.
+    progress(done, total) counts documents; cancel as in export_flattened_pdf.
+    """
+    surface = None
+    painter = AnnotationPainter()
+    total_pages = 0
+    try:
+        # Page size is set per page before drawing
+        surface = cairo.PDFSurface(output_path, 595, 842)
+        context = cairo.Context(surface)
+
+        for done, (pdf_path, store) in enumerate(sources):
+            if callable(store):
+                store = store()
+            document = Poppler.Document.new_from_file(_to_uri(pdf_path), None)
+            n_pages = document.get_n_pages()
+
+            for i in select_pages(store, n_pages, annotated_only=annotated_only):
+                if cancel is not None and cancel.is_set():
+                    surface.finish()
+                    os.remove(output_path)
+                    print(f"Merge cancelled after {done} of {len(sources)} documents")
+                    return False
+
+                page = document.get_page(i)
+                w, h = page.get_size()
+                surface.set_size(w, h)
+                context.save()
+                page.render(context)
+                context.restore()
+                page_anns = store.get_for_page(i)
+                if page_anns:
+                    painter.paint(context, page_anns)
+                surface.show_page()
+                total_pages += 1
+
+            # Drop this source before opening the next one
+            del document, store
+            if progress:
+                progress(done + 1, len(sources))
+
+        surface.finish()
+        print(f"Merged {len(sources)} documents ({total_pages} pages) into {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"Error merging PDFs: {e}")
+        import traceback
+        traceback.print_exc()
+        if surface is not None:
+            surface.finish()
+        return False
+
+def export_annotated_pdf(original_pdf_path, annotation_store, output_path,
+                         progress=None, cancel=None, pages=None):
+    """
+    Adds the annotations to a copy of the PDF as native annotation objects
+    (highlight, underline, text note) and saves it. Page content is not
+    re-rendered, so the cost scales with the number of annotations and only
+    annotated pages are touched. Poppler saves as an incremental update.
+    Same progress/cancel contract as export_flattened_pdf. The output keeps
+    every page; `pages` only limits which pages get annotations.
+    """
+    try:
+        document = Poppler.Document.new_from_file(_to_uri(original_pdf_path), None)
+        n_pages = document.get_n_pages()
+
+        # Pages without annotations have nothing to add
+        page_indices = select_pages(annotation_store, n_pages, pages, annotated_only=True)
+
+        count = 0
+        for done, i in enumerate(page_indices):
+            if cancel is not None and cancel.is_set():
+                print(f"Export cancelled after {done} of {len(page_indices)} pages")
+                return False
+
+            page = document.get_page(i)
+            _, page_height = page.get_size()
+            for ann in annotation_store.get_for_page(i):
+                annot = _make_annot(document, ann, page_height)
+                if annot:
+                    page.add_annot(annot)
+                    count += 1
+
+            if progress:
+                progress(done + 1, len(page_indices))
+
+        document.save(_to_uri(output_path))
+        print(f"Exported {count} annotations to {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"Error exporting PDF: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _to_uri(path):
+    # Poppler.Document.new_from_file and save expect URIs
+    if path.startswith("file://"):
+        return path
+    return GLib.filename_to_uri(os.path.abspath(path), None)
+
+def _make_annot(document, ann, page_height):
+    """Poppler annotation for `ann`. Poppler uses PDF space (origin bottom-left)."""
+    if not ann.rects:
+        return None
+
+    def pdf_rect(x, y, w, h):
+        rect = Poppler.Rectangle()
+        rect.x1, rect.y1 = x, page_height - (y + h)
+        rect.x2, rect.y2 = x + w, page_height - y
+        return rect
+
+    x0 = min(r[0] for r in ann.rects)
+    y0 = min(r[1] for r in ann.rects)
+    x1 = max(r[0] + r[2] for r in ann.rects)
+    y1 = max(r[1] + r[3] for r in ann.rects)
+    bounds = pdf_rect(x0, y0, x1 - x0, y1 - y0)
+
+    if ann.type in ('highlight', 'underline'):
+        quads = []
+        for x, y, w, h in ann.rects:
+            quad = Poppler.Quadrilateral()
+            # p1/p2 top edge, p3/p4 bottom edge
+            quad.p1.x, quad.p1.y = x, page_height - y
+            quad.p2.x, quad.p2.y = x + w, page_height - y
+            quad.p3.x, quad.p3.y = x, page_height - (y + h)
+            quad.p4.x, quad.p4.y = x + w, page_height - (y + h)
+            quads.append(quad)
         if ann.type == 'highlight':
-            for rect in ann.rects:
-                x, y, w, h = rect
-                c.rectangle(x, y, w, h)
-                c.fill()
-                
-        elif ann.type == 'underline':
-            c.set_line_width(1.0)
-            for rect in ann.rects:
-                x, y, w, h = rect
-                # Bottom of rect
-                c.move_to(x, y + h)
-                c.line_to(x + w, y + h)
-                c.stroke()
-        
-        elif ann.type == 'text':
-            if not ann.rects: continue
-            x, y, w, h = ann.rects[0]
-            
-            # Text rendering
-            layout = PangoCairo.create_layout(c)
-            layout.set_text(ann.content, -1)
-            
-            font_desc = Pango.FontDescription("Sans 14")
-            layout.set_font_description(font_desc)
-            
-            c.move_to(x, y)
-            PangoCairo.show_layout(c, layout)
+            annot = Poppler.AnnotTextMarkup.new_highlight(document, bounds, quads)
+        else:
+            annot = Poppler.AnnotTextMarkup.new_underline(document, bounds, quads)
+    elif ann.type == 'text':
+        # Poppler can't create free-text annotations; a text note keeps the content
+        x, y, w, h = ann.rects[0]
+        annot = Poppler.AnnotText.new(document, pdf_rect(x, y, w, h))
+        annot.set_contents(ann.content)
+    else:
+        return None
+
+    r, g, b, a = ann.color
+    color = Poppler.Color()
+    color.red, color.green, color.blue = int(r * 65535), int(g * 65535), int(b * 65535)
+    annot.set_color(color)
+    annot.set_opacity(a)
+    return annot
+
+def draw_annotations(c, annotations, painter=None):
+    """Paints annotations with the shared painter (pass one in to reuse it across pages)."""
+    (painter or AnnotationPainter()).paint(c, annotations)
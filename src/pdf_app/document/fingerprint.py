@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from pdf_app.document.journal import write_json_atomic
+
+# Content fingerprints for PDFs: SHA-256 of the whole file, read in chunks.
+# Hashing a large PDF takes a while, so results are memoized in a small JSON
+# cache keyed by (device, inode, size, mtime_ns). A repeat open costs one stat.
+# A `touch` misses the cache but hashes to the same value, so it no longer
+# shows up as a mismatch.
+
+PREFIX = "sha256:"
+CHUNK_SIZE = 1024 * 1024
+MAX_CACHE_ENTRIES = 1000
+
+_lock = threading.Lock()
+_cache: Optional[Dict[str, str]] = None
+_inflight: Dict[str, threading.Event] = {}
+
+def cache_path() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "pdf-app", "fingerprints.json")
+
+def _stat_key(st: os.stat_result) -> str:
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+def _load_cache() -> Dict[str, str]:
+    # Caller holds _lock
+    global _cache
+    if _cache is None:
+        try:
+            with open(cache_path(), 'r') as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def _store(key: str, digest: str):
+    with _lock:
+        cache = _load_cache()
+        cache.pop(key, None)
+        cache[key] = digest
+        # Oldest entries first (dict keeps insertion order)
+        while len(cache) > MAX_CACHE_ENTRIES:
+            del cache[next(iter(cache))]
+        try:
+            os.makedirs(os.path.dirname(cache_path()), exist_ok=True)
+            write_json_atomic(cache_path(), cache)
+        except OSError as e:
+            print(f"WARNING: Could not write fingerprint cache: {e}")
+
+def hash_file(path: str) -> str:
+    """Streams the file through SHA-256 without loading it into memory."""
+    hasher = hashlib.sha256()
+    buf = bytearray(CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return PREFIX + hasher.hexdigest()
+
+def _claim(key: str) -> Tuple[Optional[str], Optional[threading.Event], bool]:
+    """
+    (cached digest, None, False) when the cache has it; otherwise the key's
+    in-flight event and whether the caller owns it (and must hash the file).
+    """
+    with _lock:
+        digest = _load_cache().get(key)
+        if digest:
+            return digest, None, False
+        event = _inflight.get(key)
+        if event is not None:
+            return None, event, False
+        event = _inflight[key] = threading.Event()
+        return None, event, True
+
+def _compute(path: str, key: str, event: threading.Event) -> str:
+    """Hashes as the owner of `event`, releasing it (and any waiters) when done."""
+    try:
+        digest = hash_file(path)
+        _store(key, digest)
+        return digest
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        event.set()
+
+def get_fingerprint(path: str) -> str:
+    """
+    Content fingerprint of `path`, from the cache when the file is unchanged.
+    If warm() (or another thread) is already hashing it, waits for that
+    result instead of reading the file a second time.
+    """
+    key = _stat_key(os.stat(path))
+    digest, event, owner = _claim(key)
+    if digest:
+        return digest
+    if owner:
+        return _compute(path, key, event)
+
+    event.wait()
+    with _lock:
+        digest = _load_cache().get(key)
+    if digest:
+        return digest
+    # The other hash failed; try ourselves
+    digest = hash_file(path)
+    _store(key, digest)
+    return digest
+
+def warm(path: str) -> Optional[threading.Thread]:
+    """
+    Computes the fingerprint on a background thread so later saves don't
+    block on hashing. The in-flight slot is claimed before the thread
+    starts, so a save right after opening waits for this hash rather than
+    starting its own. Returns None when there is nothing to do.
+    """
+    try:
+        key = _stat_key(os.stat(path))
+    except OSError as e:
+        print(f"WARNING: Fingerprinting {path} failed: {e}")
+        return None
+    digest, event, owner = _claim(key)
+    if not owner:
+        return None
+
+    def run():
+        try:
+            _compute(path, key, event)
+        except Exception as e:
+            print(f"WARNING: Fingerprinting {path} failed: {e}")
+
+    thread = threading.Thread(target=run, name="fingerprint", daemon=True)
+    thread.start()
+    return thread
+
+def legacy_fingerprint(path: str) -> str:
+    """The old MD5(size, mtime, first 4 KB) fingerprint, for projects saved before SHA-256."""
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        header = f.read(4096)
+    hasher = hashlib.md5()
+    hasher.update(str(st.st_size).encode('utf-8'))
+    hasher.update(str(st.st_mtime).encode('utf-8'))
+    hasher.update(header)
+    return hasher.hexdigest()
+
+def matches(saved: str, path: str) -> bool:
+    """Compares a saved fingerprint with the file, accepting legacy MD5 fingerprints."""
+    if not saved:
+        return False
+    if saved.startswith(PREFIX):
+        return saved == get_fingerprint(path)
+    return saved == legacy_fingerprint(path)
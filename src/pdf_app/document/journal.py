@@ -0,0 +1,105 @@
+import json
+import os
+from typing import List
+
+# Append-only change log that sits next to a snapshot file (sidecar or project).
+# Each line is one JSON record:
+#   {"op": "add",    "annotation": {...}}
+#   {"op": "modify", "annotation": {...}}
+#   {"op": "remove", "id": "...", "page_index": N}
+# page_index lets lazy loads apply a removal when its page is hydrated; older
+# journals without it make the replay hydrate everything.
+# Records are idempotent (add/modify are upserts, remove ignores unknown ids),
+# so replaying a journal over a snapshot that already contains it is harmless.
+
+JOURNAL_SUFFIX = ".journal"
+
+def journal_path(snapshot_path: str) -> str:
+    return snapshot_path + JOURNAL_SUFFIX
+
+def drop_torn_tail(path: str) -> int:
+    """
+    Truncates a JSONL file back to its last newline. A crash mid-append leaves
+    a partial last line; appending after it would glue the next record onto
+    it and both would be skipped as corrupt. Returns the bytes dropped.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if not size:
+        return 0
+    with open(path, 'rb+') as f:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+        # Scan back for the end of the last complete record
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            chunk = f.read(end - start)
+            i = chunk.rfind(b"\n")
+            if i != -1:
+                end = start + i + 1
+                break
+            end = start
+        f.truncate(end)
+    print(f"WARNING: Dropped {size - end} bytes of a torn record at the end of {path}")
+    return size - end
+
+def append_records(snapshot_path: str, records: List[dict]) -> int:
+    """Appends records to the journal of snapshot_path. Returns bytes written."""
+    if not records:
+        return 0
+    payload = "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records)
+    path = journal_path(snapshot_path)
+    drop_torn_tail(path)
+    with open(path, 'a') as f:
+        f.write(payload)
+    return len(payload)
+
+def read_records(snapshot_path: str) -> List[dict]:
+    """Reads all journal records. A torn last line (crash mid-write) is skipped."""
+    return read_jsonl(journal_path(snapshot_path))
+
+def read_jsonl(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"WARNING: Skipping corrupt record in {path}")
+    return records
+
+def should_compact(snapshot_path: str, ratio: float) -> bool:
+    """True once the journal has grown past `ratio` times the snapshot size."""
+    try:
+        snapshot_size = os.path.getsize(snapshot_path)
+    except OSError:
+        return True
+    try:
+        journal_size = os.path.getsize(journal_path(snapshot_path))
+    except OSError:
+        return False
+    return journal_size > snapshot_size * ratio
+
+def remove_journal(snapshot_path: str):
+    try:
+        os.remove(journal_path(snapshot_path))
+    except FileNotFoundError:
+        pass
+
+def write_json_atomic(path: str, data: dict):
+    """Writes JSON via a temp file + rename so a crash never leaves half a snapshot."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
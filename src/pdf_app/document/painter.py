@@ -0,0 +1,82 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import gi
+gi.require_version('Pango', '1.0')
+gi.require_version('PangoCairo', '1.0')
+from gi.repository import Pango, PangoCairo
+
+# Annotation painting shared by the page view and the exporters, so what is
+# exported matches what is on screen. Coordinates are PDF points; callers
+# scale the context first.
+
+TEXT_FONT = "Sans 12"
+UNDERLINE_WIDTH = 1.0
+
+Color = Tuple[float, float, float, float]
+
+class AnnotationPainter:
+    """
+    Paints annotations onto a cairo context.
+
+    All highlight rects of one color become a single path and one fill, and
+    all underlines of one color one stroke. Text notes reuse one font
+    description and one Pango layout. Not thread-safe: use one painter per
+    thread (the view and each export job own their own).
+    """
+
+    def __init__(self, font: str = TEXT_FONT):
+        self.font_desc = Pango.FontDescription(font)
+        self._layout: Optional[Pango.Layout] = None
+
+    def _get_layout(self, c) -> Pango.Layout:
+        if self._layout is None:
+            self._layout = PangoCairo.create_layout(c)
+            self._layout.set_font_description(self.font_desc)
+        else:
+            # Reuse the layout; only pick up the new context's transform/font options
+            PangoCairo.update_layout(c, self._layout)
+        return self._layout
+
+    def paint(self, c, annotations,
+              on_text_measured: Optional[Callable[[object, float, float], None]] = None):
+        """
+        Highlights first, then underlines, then text on top. on_text_measured(ann, w, h)
+        reports each text note's laid-out size in PDF points.
+        """
+        highlights: Dict[Color, List[tuple]] = {}
+        underlines: Dict[Color, List[tuple]] = {}
+        texts = []
+        for ann in annotations:
+            if ann.type == 'highlight':
+                highlights.setdefault(tuple(ann.color), []).extend(ann.rects)
+            elif ann.type == 'underline':
+                underlines.setdefault(tuple(ann.color), []).extend(ann.rects)
+            elif ann.type == 'text' and ann.rects:
+                texts.append(ann)
+
+        for color, rects in highlights.items():
+            c.set_source_rgba(*color)
+            for x, y, w, h in rects:
+                c.rectangle(x, y, w, h)
+            c.fill()
+
+        if underlines:
+            c.set_line_width(UNDERLINE_WIDTH)
+            for color, rects in underlines.items():
+                c.set_source_rgba(*color)
+                for x, y, w, h in rects:
+                    c.move_to(x, y + h)
+                    c.line_to(x + w, y + h)
+                c.stroke()
+
+        if texts:
+            layout = self._get_layout(c)
+            for ann in texts:
+                x, y, _w, _h = ann.rects[0]
+                c.set_source_rgba(*ann.color)
+                layout.set_text(ann.content, -1)
+                c.move_to(x, y)
+                PangoCairo.show_layout(c, layout)
+                if on_text_measured:
+                    _ink, logical = layout.get_extents()
+                    on_text_measured(ann, logical.width / Pango.SCALE, logical.height / Pango.SCALE)
@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import cairo
+import gi
+gi.require_version('Poppler', '0.18')
+from gi.repository import GLib, Poppler
+
+from pdf_app.document.painter import AnnotationPainter
+from pdf_app.document.export import select_pages
+
+# Rasterizes pages (PDF content + annotations) to PNG files on a process pool.
+# Each worker opens its own Poppler document once and renders the pages it is
+# handed; only file paths travel back, so memory stays bounded by
+# `workers` page surfaces no matter how many pages are exported.
+
+FORMATS = ("png", "tiff")  # One PNG per page, or one multi-page TIFF
+DPI_CHOICES = (72, 150, 300, 600)
+
+_worker_document = None
+_worker_painter = None
+
+def _init_worker(uri: str):
+    global _worker_document, _worker_painter
+    _worker_document = Poppler.Document.new_from_file(uri, None)
+    _worker_painter = AnnotationPainter()
+
+def _render_page(task) -> str:
+    page_index, annotations, scale, out_path = task
+
+    page = _worker_document.get_page(page_index)
+    w, h = page.get_size()
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, int(w * scale), int(h * scale))
+    context = cairo.Context(surface)
+    context.set_source_rgb(1, 1, 1)
+    context.paint()
+    context.scale(scale, scale)
+    page.render(context)
+    if annotations:
+        _worker_painter.paint(context, annotations)
+    # Rename into place so a cancelled export never leaves a truncated PNG
+    part_path = out_path + ".part"
+    surface.write_to_png(part_path)
+    surface.finish()
+    os.replace(part_path, out_path)
+    return out_path
+
+def _mtimes(paths: List[str]) -> Dict[str, Optional[int]]:
+    result = {}
+    for path in paths:
+        try:
+            result[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            result[path] = None
+    return result
+
+def _remove_written(before: Dict[str, Optional[int]]):
+    """Deletes what a cancelled run wrote: files that are new or changed since `before`."""
+    after = _mtimes(list(before))
+    removed = 0
+    for path, mtime in after.items():
+        if mtime is not None and mtime != before[path]:
+            os.remove(path)
+            removed += 1
+        try:
+            os.remove(path + ".part")
+        except FileNotFoundError:
+            pass
+    print(f"Removed {removed} images written before the cancel")
+
+def export_page_images(pdf_path: str, annotation_store, output_dir: str, dpi: int = 150,
+                       pages=None, annotated_only: bool = True,
+                       tiff_path: Optional[str] = None, keep_pngs: bool = True,
+                       workers: Optional[int] = None, progress=None, cancel=None) -> List[str]:
+    """
+    Writes output_dir/page-NNNN.png for each page and returns the paths in
+    page order. `pages` (0-based list or range string) limits the selection;
+    by default only annotated pages are exported.
+
+    annotation_store: anything with get_for_page()/page_indices (a snapshot when called
+    from the UI). tiff_path additionally bundles the PNGs into one multi-page
+    TIFF (needs Pillow); with keep_pngs=False the PNGs are only scratch files
+    and [tiff_path] is returned. progress(done, total) / cancel
+    (threading.Event) as in export_flattened_pdf. Returns [] when cancelled,
+    after removing the images written so far.
+    """
+    if tiff_path:
+        _tiff_writer()  # Fail before rendering anything when Pillow is missing
+    uri = GLib.filename_to_uri(os.path.abspath(pdf_path), None)
+    n_pages = Poppler.Document.new_from_file(uri, None).get_n_pages()
+    pages = select_pages(annotation_store, n_pages, pages, annotated_only)
+    if not pages:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    scratch = tiff_path is not None and not keep_pngs
+    png_dir = tempfile.mkdtemp(prefix=".pages-", dir=output_dir) if scratch else output_dir
+    try:
+        scale = dpi / 72.0
+        tasks = [(i, list(annotation_store.get_for_page(i)), scale,
+                  os.path.join(png_dir, f"page-{i + 1:04d}.png")) for i in pages]
+        before = _mtimes([task[3] for task in tasks])
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+        print(f"Rasterizing {len(tasks)} pages at {dpi} DPI with {workers} workers")
+
+        # spawn: workers must not inherit GTK/GLib state from a forked UI process
+        ctx = multiprocessing.get_context('spawn')
+        paths = []
+        pool = ctx.Pool(workers, initializer=_init_worker, initargs=(uri,))
+        try:
+            # imap keeps page order; results are only paths
+            for path in pool.imap(_render_page, tasks):
+                if cancel is not None and cancel.is_set():
+                    break
+                paths.append(path)
+                if progress:
+                    progress(len(paths), len(tasks))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if cancel is not None and cancel.is_set():
+            print(f"Image export cancelled after {len(paths)} of {len(tasks)} pages")
+            # Workers are gone now, so nothing else gets written behind our back
+            if not scratch:
+                _remove_written(before)
+            return []
+
+        if tiff_path:
+            write_tiff(paths, tiff_path, dpi)
+        return [tiff_path] if scratch else paths
+    finally:
+        if scratch:
+            shutil.rmtree(png_dir, ignore_errors=True)
+
+def _tiff_writer():
+    try:
+        from PIL import Image, TiffImagePlugin
+    except ImportError:
+        raise RuntimeError("Multi-page TIFF output needs Pillow (pip install Pillow)")
+    return Image, TiffImagePlugin
+
+def write_tiff(png_paths: List[str], tiff_path: str, dpi: int):
+    """Bundles PNG pages into one multi-page TIFF. Images are opened one at a time."""
+    Image, TiffImagePlugin = _tiff_writer()
+
+    # AppendingTiffWriter streams frames, so only one page is decoded at a time
+    with TiffImagePlugin.AppendingTiffWriter(tiff_path, True) as tiff:
+        for path in png_paths:
+            with Image.open(path) as im:
+                im.save(tiff, format="TIFF", compression="tiff_deflate", dpi=(dpi, dpi))
+            tiff.newFrame()
+    print(f"Wrote {len(png_paths)} pages to {tiff_path}")
@@ -0,0 +1,63 @@
+import json
+import os
+from typing import List
+
+from pdf_app.document.journal import drop_torn_tail, read_jsonl
+
+# Lives next to the sidecar: <pdf>.json.recovery
+# Uses the journal record format. When a project file replaces the document's
+# annotations, the log restarts with {"op": "reset", "project": <path>} and
+# later records apply on top of that project.
+RECOVERY_SUFFIX = ".recovery"
+
+class RecoveryLog:
+    """
+    Per-document log of unsaved edits, one journal-style record per mutation.
+    Only survives a crash: it is truncated on save and deleted on a clean close.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def read(self) -> List[dict]:
+        return read_jsonl(self.path)
+
+    def _open(self):
+        if self._file is None:
+            # A crash mid-append leaves half a line; don't glue the next record onto it
+            drop_torn_tail(self.path)
+            self._file = open(self.path, 'a')
+
+    def append(self, record: dict):
+        self._open()
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        # Flush to the OS so the record survives the process dying
+        self._file.flush()
+
+    def append_many(self, records: List[dict]):
+        """Like append() for a batch of records, with a single flush."""
+        if not records:
+            return
+        self._open()
+        self._file.write("".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records))
+        self._file.flush()
+
+    def truncate(self):
+        self.close()
+        if os.path.exists(self.path):
+            open(self.path, 'w').close()
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,228 @@
+import gzip
+import json
+import os
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from pdf_app.document import fingerprint
+
+# Full-text search index: the text of every page plus one glyph box per
+# character, extracted from Poppler once (on a background job) and cached on
+# disk per document fingerprint. Queries only scan the cached strings, so
+# "find all" never touches Poppler once the index exists.
+#
+# Cache file (gzip): one JSON header line with the page texts, followed by
+# each page's boxes as little-endian float32 (x1, y1, x2, y2) per character.
+
+INDEX_VERSION = 1
+MAX_RESULTS = 1000
+SNIPPET_CONTEXT = 30
+
+Rect = Tuple[float, float, float, float]  # (x, y, w, h) in PDF points
+
+@dataclass
+class SearchHit:
+    page_index: int
+    start: int  # offset into the page text
+    length: int
+    rects: List[Rect]  # one per line of the match
+    snippet: str
+
+def _fold(text: str) -> str:
+    # Case-insensitive matching needs offsets that still line up with the
+    # boxes; a few characters lowercase to more than one code point.
+    # Line breaks match a space so phrases can span lines.
+    folded = text.lower()
+    if len(folded) != len(text):
+        folded = ''.join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+    return folded.replace('\n', ' ')
+
+class SearchIndex:
+    def __init__(self, fingerprint: str, texts: List[str], boxes: List[array]):
+        self.fingerprint = fingerprint
+        self.texts = texts
+        self.boxes = boxes  # per page: array('f'), 4 floats per character of the text
+        self._folded = [_fold(t) for t in texts]
+
+    @property
+    def n_pages(self) -> int:
+        return len(self.texts)
+
+    def search(self, query: str, limit: Optional[int] = MAX_RESULTS) -> List[SearchHit]:
+        """Case-insensitive substring search, in page order. At most `limit` hits (None: all)."""
+        query = _fold(query.strip())
+        if not query:
+            return []
+        hits = []
+        for page_index, folded in enumerate(self._folded):
+            pos = folded.find(query)
+            while pos != -1:
+                hits.append(self._hit(page_index, pos, len(query)))
+                if limit is not None and len(hits) >= limit:
+                    return hits
+                pos = folded.find(query, pos + len(query))
+        return hits
+
+    def _hit(self, page_index: int, start: int, length: int) -> SearchHit:
+        text = self.texts[page_index]
+        lo = max(0, start - SNIPPET_CONTEXT)
+        hi = min(len(text), start + length + SNIPPET_CONTEXT)
+        snippet = ("…" if lo else "") + " ".join(text[lo:hi].split()) + ("…" if hi < len(text) else "")
+        return SearchHit(page_index, start, length, self.match_rects(page_index, start, length), snippet)
+
+    def match_rects(self, page_index: int, start: int, length: int) -> List[Rect]:
+        """Boxes of text[start:start + length] merged into one rect per line."""
+        boxes = self.boxes[page_index]
+        text = self.texts[page_index]
+        rects = []
+        cur = None  # [x1, y1, x2, y2] of the current line
+        for i in range(start, min(start + length, len(text))):
+            if text[i] == '\n' or 4 * i + 3 >= len(boxes):
+                continue
+            x1, y1, x2, y2 = boxes[4 * i:4 * i + 4]
+            if x2 <= x1 or y2 <= y1:
+                continue
+            cy = (y1 + y2) / 2
+            if cur is not None and cur[1] <= cy <= cur[3]:
+                cur[0], cur[1] = min(cur[0], x1), min(cur[1], y1)
+                cur[2], cur[3] = max(cur[2], x2), max(cur[3], y2)
+            else:
+                cur = [x1, y1, x2, y2]
+                rects.append(cur)
+        return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in rects]
+
+    def save(self, path: Optional[str] = None):
+        path = path or index_path(self.fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {
+            "version": INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "texts": self.texts,
+            "boxes": [len(b) for b in self.boxes],
+        }
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(json.dumps(header).encode('utf-8') + b"\n")
+            for b in self.boxes:
+                if sys.byteorder != 'little':
+                    b = array('f', b)
+                    b.byteswap()
+                f.write(b.tobytes())
+        os.replace(tmp_path, path)
+        print(f"DEBUG: Saved search index ({self.n_pages} pages) to {path}")
+
+def index_path(fp: str) -> str:
+    cache_dir = os.path.join(os.path.dirname(fingerprint.cache_path()), "search")
+    return os.path.join(cache_dir, fp.replace(":", "-") + ".idx.gz")
+
+def load_search_index(fp: str, path: Optional[str] = None) -> Optional[SearchIndex]:
+    """The cached index for fingerprint `fp`, or None if there is none (or it's stale/corrupt)."""
+    path = path or index_path(fp)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header.get("version") != INDEX_VERSION or header.get("fingerprint") != fp:
+                return None
+            boxes = []
+            for n in header["boxes"]:
+                b = array('f')
+                b.frombytes(f.read(n * b.itemsize))
+                if len(b) != n:
+                    raise ValueError("truncated index")
+                if sys.byteorder != 'little':
+                    b.byteswap()
+                boxes.append(b)
+        return SearchIndex(fp, header["texts"], boxes)
+    except Exception as e:
+        print(f"WARNING: Ignoring unreadable search index {path}: {e}")
+        return None
+
+def build_search_index(pdf_path: str, fp: str, progress=None, cancel=None) -> Optional[SearchIndex]:
+    """
+    Extracts text and glyph boxes for every page. Opens its own Poppler
+    document, so it can run on a worker thread. Returns None when cancelled.
+    """
+    import gi
+    gi.require_version('Poppler', '0.18')
+    from gi.repository import GLib, Poppler
+
+    uri = GLib.filename_to_uri(os.path.abspath(pdf_path), None)
+    document = Poppler.Document.new_from_file(uri, None)
+    n_pages = document.get_n_pages()
+    texts, boxes = [], []
+    for i in range(n_pages):
+        if cancel is not None and cancel.is_set():
+            print(f"Search indexing cancelled at page {i + 1} of {n_pages}")
+            return None
+        page = document.get_page(i)
+        text = page.get_text() or ""
+        ok, rects = page.get_text_layout()
+        flat = array('f')
+        if ok and len(rects) == len(text):
+            for r in rects:
+                flat.extend((r.x1, r.y1, r.x2, r.y2))
+        elif text:
+            # Shouldn't happen, but keep the text searchable without boxes
+            print(f"WARNING: Page {i + 1}: {len(rects or [])} glyph boxes for {len(text)} characters")
+        texts.append(text)
+        boxes.append(flat)
+        if progress:
+            progress(i + 1, n_pages)
+    return SearchIndex(fp, texts, boxes)
+
+def get_search_index(pdf_path: str, progress=None, cancel=None) -> Optional[SearchIndex]:
+    """Cached index for the PDF, building (and caching) it first if needed."""
+    fp = fingerprint.get_fingerprint(pdf_path)
+    index = load_search_index(fp)
+    if index is not None:
+        print(f"DEBUG: Loaded cached search index for {pdf_path}")
+        return index
+    index = build_search_index(pdf_path, fp, progress, cancel)
+    if index is not None:
+        try:
+            index.save()
+        except OSError as e:
+            print(f"WARNING: Could not cache search index: {e}")
+    return index
+
+def find_text_rects(pdf_path: str, term: str, progress=None, cancel=None) -> Iterator[Tuple[int, List[Rect]]]:
+    """
+    Yields (page_index, rects) per occurrence using Poppler's find_text, for
+    when there is no index yet. Poppler reports one rect per line and can't
+    tell which lines belong together, so a match that wraps yields one
+    occurrence per line. Opens its own document (worker-thread safe); stops
+    early when cancelled.
+    """
+    import gi
+    gi.require_version('Poppler', '0.18')
+    from gi.repository import GLib, Poppler
+
+    uri = GLib.filename_to_uri(os.path.abspath(pdf_path), None)
+    document = Poppler.Document.new_from_file(uri, None)
+    n_pages = document.get_n_pages()
+    for i in range(n_pages):
+        if cancel is not None and cancel.is_set():
+            return
+        page = document.get_page(i)
+        _w, h = page.get_size()
+        for r in page.find_text(term) or []:
+            # find_text uses PDF coordinates (origin bottom-left)
+            yield i, [(r.x1, h - r.y2, r.x2 - r.x1, r.y2 - r.y1)]
+        if progress:
+            progress(i + 1, n_pages)
+
+def find_all(pdf_path: str, term: str, index: Optional[SearchIndex] = None,
+             progress=None, cancel=None) -> Iterator[Tuple[int, List[Rect]]]:
+    """Every occurrence of `term` as (page_index, rects): from the index when given, else via Poppler."""
+    if index is not None:
+        for hit in index.search(term, limit=None):
+            if hit.rects:
+                yield hit.page_index, hit.rects
+        if progress:
+            progress(index.n_pages, index.n_pages)
+        return
+    yield from find_text_rects(pdf_path, term, progress, cancel)
@@ -0,0 +1,310 @@
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from typing import List, Optional, Set
+
+from pdf_app.document.store import Annotation, AnnotationStore
+from pdf_app.document.recovery import RECOVERY_SUFFIX
+from pdf_app.utils.geometry import bbox_of, pack_rect_lists
+
+# Database next to the PDF: <pdf>.annotations.db
+DB_SUFFIX = ".annotations.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    document    TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    seq         INTEGER NOT NULL,   -- draw order
+    page_index  INTEGER NOT NULL,
+    type        TEXT NOT NULL,
+    rects       BLOB NOT NULL,      -- packed little-endian f64 (x, y, w, h) * n
+    color_r     REAL, color_g REAL, color_b REAL, color_a REAL,
+    content     TEXT,
+    style       TEXT,
+    created_at  TEXT,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL,  -- bounding box of rects
+    PRIMARY KEY (document, id)
+);
+CREATE INDEX IF NOT EXISTS idx_annotations_page ON annotations (document, page_index, seq);
+CREATE INDEX IF NOT EXISTS idx_annotations_bbox ON annotations (document, page_index, x0, x1, y0, y1);
+"""
+
+UPSERT = """
+INSERT INTO annotations (document, id, seq, page_index, type, rects,
+                         color_r, color_g, color_b, color_a,
+                         content, style, created_at, x0, y0, x1, y1)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (document, id) DO UPDATE SET
+    page_index = excluded.page_index, type = excluded.type, rects = excluded.rects,
+    color_r = excluded.color_r, color_g = excluded.color_g,
+    color_b = excluded.color_b, color_a = excluded.color_a,
+    content = excluded.content, style = excluded.style, created_at = excluded.created_at,
+    x0 = excluded.x0, y0 = excluded.y0, x1 = excluded.x1, y1 = excluded.y1
+"""
+
+COLUMNS = "id, page_index, type, rects, color_r, color_g, color_b, color_a, content, style, created_at"
+
+def _pack_rects(rects) -> bytes:
+    flat = [v for r in rects for v in r]
+    return struct.pack(f'<{len(flat)}d', *flat)
+
+def _unpack_rects(blob: bytes) -> List[tuple]:
+    flat = struct.unpack(f'<{len(blob) // 8}d', blob)
+    return [tuple(flat[i:i + 4]) for i in range(0, len(flat), 4)]
+
+def _bbox(rects):
+    # The bbox columns are NOT NULL
+    return bbox_of(rects) or (0.0, 0.0, 0.0, 0.0)
+
+class SQLiteAnnotationStore(AnnotationStore):
+    """
+    AnnotationStore backed by SQLite (WAL mode) instead of a JSON file.
+    Pages are read on demand through the page index, hit tests use the bbox
+    index, and save() writes only the changed rows in one transaction.
+    One database can hold several documents, keyed by `document`.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, document: Optional[str] = None):
+        super().__init__()
+        self.db_path = db_path
+        self.document = document
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_thread: Optional[int] = None  # sqlite3 connections stay on their thread
+        self._pdf_path: Optional[str] = None
+        self._next_seq = 0
+        # Set when the whole document was replaced (project import, recovery)
+        self._replace_all = False
+        # Pages whose in-memory geometry no longer matches their bbox columns
+        self._drifted_pages: Set[int] = set()
+
+    @staticmethod
+    def exists_for(pdf_path: str) -> bool:
+        return os.path.exists(pdf_path + DB_SUFFIX)
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        self._conn = sqlite3.connect(self.file_path)
+        self._conn_thread = threading.get_ident()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def load(self, pdf_path: str, recovery: bool = False, lazy: bool = True, strict: bool = False):
+        """Opens the database and indexes the document's pages; rows are read per page."""
+        self._pdf_path = pdf_path
+        self.file_path = self.db_path or pdf_path + DB_SUFFIX
+        if self.document is None:
+            self.document = os.path.basename(pdf_path)
+        self.annotations = []
+        self._pending.clear()
+        self._replace_all = False
+        self._drifted_pages.clear()
+        self.recovered_count = 0
+
+        try:
+            self._open()
+            pages = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT page_index FROM annotations WHERE document = ?", (self.document,))]
+            self._next_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM annotations WHERE document = ?",
+                (self.document,)).fetchone()[0]
+            self._load_lazy({page: (lambda page=page: self._query_page(page)) for page in pages})
+            if not lazy:
+                self._hydrate_all()
+            print(f"Loaded {len(pages)} pages of annotations from {self.file_path}")
+        except sqlite3.Error as e:
+            print(f"Error loading annotations: {e}")
+            self.annotations = []
+            if strict:
+                raise
+
+        if recovery:
+            self._recover()
+
+    def _query_page(self, page_index: int) -> List[Annotation]:
+        if threading.get_ident() == self._conn_thread:
+            return self._read_page(self._conn, page_index)
+        # Snapshot readers load lazy pages on worker threads: use a connection
+        # of their own (WAL lets it read while the UI writes)
+        conn = sqlite3.connect(self.file_path)
+        try:
+            return self._read_page(conn, page_index)
+        finally:
+            conn.close()
+
+    def _read_page(self, conn: sqlite3.Connection, page_index: int) -> List[Annotation]:
+        rows = conn.execute(
+            f"SELECT {COLUMNS} FROM annotations WHERE document = ? AND page_index = ? ORDER BY seq",
+            (self.document, page_index))
+        return [self._from_row(row) for row in rows]
+
+    def _from_row(self, row) -> Annotation:
+        (ann_id, page_index, type, rects, r, g, b, a, content, style, created_at) = row
+        return Annotation(
+            id=ann_id, type=type, page_index=page_index,
+            rects=_unpack_rects(rects), color=(r, g, b, a),
+            content=content or "", style=style or "standard", created_at=created_at or ""
+        )
+
+    def _to_row(self, ann: Annotation) -> tuple:
+        seq = self._next_seq
+        self._next_seq += 1
+        r, g, b, a = ann.color
+        return (self.document, ann.id, seq, ann.page_index, ann.type, _pack_rects(ann.rects or []),
+                r, g, b, a, ann.content, ann.style, ann.created_at, *_bbox(ann.rects))
+
+    def _flush(self):
+        """Writes pending changes in one transaction. Cost is O(changes)."""
+        if self._conn is None:
+            return
+        with self._conn:
+            if self._replace_all:
+                self._conn.execute("DELETE FROM annotations WHERE document = ?", (self.document,))
+                self._conn.executemany(UPSERT, [self._to_row(ann) for ann in self.annotations])
+                self._replace_all = False
+                self._drifted_pages.clear()
+            else:
+                removed = [(self.document, annotation_id)
+                           for annotation_id, (op, _) in self._pending.items() if op == 'remove']
+                upserts = [self._to_row(ann)
+                           for op, ann in self._pending.values() if op != 'remove']
+                if removed:
+                    self._conn.executemany(
+                        "DELETE FROM annotations WHERE document = ? AND id = ?", removed)
+                if upserts:
+                    self._conn.executemany(UPSERT, upserts)
+        if self._pending:
+            # The same set feeds the project journal; once drained here, the
+            # last exported project can only be brought up to date by a full write
+            self._pending.clear()
+            self._journal_base = None
+
+    def save(self):
+        """Commits changed rows to the database."""
+        if self._conn is None:
+            return
+        try:
+            count = len(self._pending)
+            self._flush()
+            print(f"Saved {count} changed annotations to {self.file_path}")
+            self._truncate_recovery()
+            self.is_dirty = False
+        except sqlite3.Error as e:
+            print(f"Error saving annotations: {e}")
+
+    def save_to_file(self, path: str, pdf_path: str):
+        """Exports a JSON/binary project after committing pending rows."""
+        self._flush()
+        super().save_to_file(path, pdf_path)
+
+    def read_project(self, path: str, lazy: bool = False) -> str:
+        fingerprint = super().read_project(path, lazy)
+        self._replace_all = True
+        return fingerprint
+
+    def load_from_file(self, path: str, pdf_path: str, lazy: bool = False) -> bool:
+        """Imports a JSON/binary project, replacing the document's rows."""
+        mismatch = super().load_from_file(path, pdf_path, lazy)
+        self._flush()
+        return mismatch
+
+    def _recover(self):
+        super()._recover()
+        if not self.recovered_count:
+            return
+        records = self._recovery.read()
+        if records[0].get("op") == "reset":
+            self._replace_all = True
+            return
+        # Turn the replayed records into pending rows so save() stays incremental
+        for rec in records:
+            if rec.get("op") == "remove":
+                annotation_id = rec.get("id")
+                page_index = self._stored_page(annotation_id)
+                if page_index is None:
+                    # Added and removed within the crashed session, never stored
+                    self._pending.pop(annotation_id, None)
+                else:
+                    # Only the id and page are needed to delete the row
+                    self._pending[annotation_id] = ('remove', Annotation(annotation_id, "", page_index, []))
+            else:
+                # Only the touched pages are loaded; the record's page applies on hydration
+                self._hydrate_page(rec["annotation"].get("page_index", 0))
+                ann = self._find(rec["annotation"]["id"])
+                if ann:
+                    self._pending[ann.id] = ('modify', ann)
+
+    def _stored_page(self, annotation_id: str) -> Optional[int]:
+        """Page of the annotation's row in the database, None if it has none."""
+        row = self._conn.execute(
+            "SELECT page_index FROM annotations WHERE document = ? AND id = ?",
+            (self.document, annotation_id)).fetchone()
+        return row[0] if row else None
+
+    def _recovery_path(self) -> str:
+        # Per document even when several documents share one database
+        return self._pdf_path + DB_SUFFIX + RECOVERY_SUFFIX
+
+    def invalidate_page(self, page_index: int):
+        # The tweak isn't saved, so the page's bbox columns stay stale
+        self._drifted_pages.add(page_index)
+        super().invalidate_page(page_index)
+
+    def _page_is_clean(self, page_index: int) -> bool:
+        if self._replace_all or page_index in self._drifted_pages:
+            return False
+        return not any(ann.page_index == page_index for _, ann in self._pending.values())
+
+    def annotations_in_rect(self, page_index: int, x0: float, y0: float,
+                            x1: float, y1: float) -> List[Annotation]:
+        """Annotations whose bounding box intersects the rect, in draw order."""
+        page_anns = self.get_for_page(page_index)
+        if not self._page_is_clean(page_index):
+            return [a for a in page_anns
+                    if a.rects and _intersects(_bbox(a.rects), (x0, y0, x1, y1))]
+
+        ids = {row[0] for row in self._conn.execute(
+            "SELECT id FROM annotations WHERE document = ? AND page_index = ? "
+            "AND x0 <= ? AND x1 >= ? AND y0 <= ? AND y1 >= ?",
+            (self.document, page_index, x1, x0, y1, y0))}
+        return [a for a in page_anns if a.id in ids]
+
+    def _hit_candidates(self, page_index: int, x: float, y: float, tolerance: float) -> List[Annotation]:
+        return self.annotations_in_rect(page_index, x - tolerance, y - tolerance,
+                                        x + tolerance, y + tolerance)
+
+    def _hit_arrays(self, page_index: int, x: float, y: float, tolerance: float):
+        # Candidates come from a bbox query around the point, so nothing to cache
+        candidates = [a for a in self._hit_candidates(page_index, x, y, tolerance) if a.rects]
+        rects, owners = pack_rect_lists([a.rects for a in candidates])
+        return candidates, rects, owners
+
+def _intersects(a, b) -> bool:
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+def migrate_to_sqlite(pdf_path: str, project_path: Optional[str] = None,
+                      db_path: Optional[str] = None) -> SQLiteAnnotationStore:
+    """Imports a sidecar (or project file) into the document's database."""
+    store = SQLiteAnnotationStore(db_path)
+    store.load(pdf_path)
+    source = project_path or pdf_path + ".json"
+    if os.path.exists(source):
+        store.load_from_file(source, pdf_path, lazy=True)
+    return store
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m pdf_app.document.sqlite_store PDF [PROJECT]")
+        print(f"Imports PDF's sidecar (or PROJECT) into PDF{DB_SUFFIX}.")
+        sys.exit(2)
+    store = migrate_to_sqlite(*sys.argv[1:])
+    print(f"Imported {len(store.annotations)} annotations into {store.file_path}")
+    store.close()
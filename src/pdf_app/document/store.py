@@ -1,8 +1,16 @@
 import json
+import threading
+import time
 import uuid
 import os
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass, field, asdict
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Set, Tuple
+
+from pdf_app.document import journal, binary_format, fingerprint
+from pdf_app.document.recovery import RecoveryLog, RECOVERY_SUFFIX
+from pdf_app.utils.geometry import RectArray, bbox_of, pack_rect_lists, translate_rects
 
 @dataclass
 class Annotation:
@@ -37,16 +45,152 @@ class Annotation:
             content=content
         )
 
+    @classmethod
+    def from_dict(cls, item: dict) -> 'Annotation':
+        """Builds an Annotation from its JSON form (lists become tuples)."""
+        # Backwards compat: If ID missing, generate one
+        if 'id' not in item: item['id'] = str(uuid.uuid4())
+        ann = cls(**item)
+        ann.color = tuple(ann.color)
+        ann.rects = [tuple(r) for r in ann.rects]
+        return ann
+
+@dataclass(frozen=True)
+class StoreChange:
+    """One change delivered to connect_changed() listeners."""
+    kind: str  # 'added', 'removed', 'modified', or 'reset' (everything replaced)
+    annotation_id: Optional[str] = None
+    page_index: Optional[int] = None
+    # (x0, y0, x1, y1) in PDF points; for 'modified' it covers old and new rects
+    bbox: Optional[Tuple[float, float, float, float]] = None
+
+def _frozen(anns) -> Tuple[Annotation, ...]:
+    """Detached copies with tuple rects, for snapshots."""
+    return tuple(
+        Annotation(ann.id, ann.type, ann.page_index, tuple(map(tuple, ann.rects or ())),
+                   ann.color, ann.content, ann.style, ann.created_at)
+        for ann in anns)
+
+class AnnotationSnapshot:
+    """
+    Read-only copy of the store at one version, safe to use from a worker
+    thread while the UI keeps editing. Annotations are detached copies
+    (rects as tuples); treat them as immutable. Pages the store hadn't
+    hydrated yet are loaded here on first access, i.e. on the reader's thread.
+    """
+
+    def __init__(self, version: int, pages: Dict[int, Tuple[Annotation, ...]],
+                 loaders: Optional[Dict[int, Callable[[], List[Annotation]]]] = None):
+        self.version = version
+        self._pages = pages
+        self._loaders = loaders or {}
+        self._lock = threading.Lock()
+
+    def _pin(self, page_index: int, anns: Tuple[Annotation, ...]):
+        """Takes a lazy page's content from the store before the store changes it."""
+        if page_index in self._loaders:
+            with self._lock:
+                self._pages.setdefault(page_index, anns)
+
+    def get_for_page(self, page_index: int) -> Tuple[Annotation, ...]:
+        anns = self._pages.get(page_index)
+        if anns is not None:
+            return anns
+        loader = self._loaders.get(page_index)
+        if loader is None:
+            return ()
+        with self._lock:  # Snapshots are shared between jobs
+            anns = self._pages.get(page_index)
+            if anns is None:
+                anns = self._pages[page_index] = _frozen(loader())
+        return anns
+
+    @property
+    def page_indices(self) -> List[int]:
+        return sorted(set(self._pages) | set(self._loaders))
+
+    @property
+    def annotations(self) -> List[Annotation]:
+        return [ann for page_index in self.page_indices for ann in self.get_for_page(page_index)]
+
+    def __len__(self) -> int:
+        return sum(len(self.get_for_page(page_index)) for page_index in self.page_indices)
+
 class AnnotationStore:
+    # Snapshot is rewritten once the journal grows past this fraction of it
+    journal_compact_ratio = 0.5
+    # Undo history bounds; the oldest entries are dropped first
+    undo_limit = 200
+    undo_rect_budget = 20000
+    # Seconds between edits of one annotation that still merge into one undo entry
+    coalesce_window = 2.0
+
     def __init__(self):
-        self.annotations: List[Annotation] = []
+        self._annotations: List[Annotation] = []
+        # Lazy loads: page -> loader returning that page's Annotation objects.
+        # Pages are hydrated on first get_for_page/find_annotation_at.
+        self._unhydrated: Dict[int, Callable[[], List[Annotation]]] = {}
         self.file_path: Optional[str] = None
+        self._sidecar_binary: bool = False # Sidecar keeps the format it was loaded in
         self._is_dirty: bool = False 
         self.on_dirty_changed = None # Callback function(is_dirty: bool)
+        # Change listeners: handler id -> callback(changes: List[StoreChange])
+        self._listeners: Dict[int, Callable[[List[StoreChange]], None]] = {}
+        self._next_listener_id = 1
+
+        # snapshot() state: bumped on every change; frozen per-page tuples are
+        # reused until their page changes. _snapshot_stale lists the pages to
+        # copy again (None: all of them).
+        self._version = 0
+        self._snapshot_pages: Dict[int, Tuple[Annotation, ...]] = {}
+        self._snapshot_stale: Optional[Set[int]] = None
+        self._snapshot: Optional[AnnotationSnapshot] = None
+        # Snapshots still holding page loaders. Loaders read the backing file
+        # (or database) when called, so a page is pinned into these as soon as
+        # the store hydrates it, before it can be edited and saved.
+        self._lazy_snapshots = weakref.WeakSet()
+
+        # batch() state: nested depth, collected undo entries/changes, deferred dirty flag
+        self._batch_depth = 0
+        self._batch_entries: List[tuple] = []
+        self._batch_changes: List[StoreChange] = []
+        self._batch_dirty: Optional[bool] = None
+        self._batch_recovery: List[dict] = []  # Recovery records, written when the batch ends
+        self._deferred_removals: Optional[Set[str]] = None  # Ids to drop in one pass (batch undo/redo)
+        # page -> (annotations, packed rects, owning annotation per rect) for hit tests
+        self._hit_cache: Dict[int, Tuple[List[Annotation], RectArray, List[int]]] = {}
         
-        # Undo/Redo stacks store tuples: (operation, annotation)
+        # Undo/Redo stacks store tuples: ('add'|'remove', annotation),
+        # ('modify', id, old_rects), ('move', id, dx, dy), ('text', id, old_content)
         self._undo_stack: List[tuple] = []
         self._redo_stack: List[tuple] = []
+        self._coalesce_key: Optional[tuple] = None
+        self._coalesce_time: float = 0.0
+
+        # Changes since the last save, keyed by annotation id: (op, annotation).
+        # Flushed to the journal of _journal_base instead of rewriting it.
+        self._pending: Dict[str, Tuple[str, Annotation]] = {}
+        self._journal_base: Optional[str] = None
+
+        # Crash recovery log (enabled by load(..., recovery=True)). The log is
+        # relative to the sidecar, or to _recovery_base when it starts with a
+        # 'reset' header naming a project.
+        self._recovery: Optional[RecoveryLog] = None
+        self._recovery_base: Optional[str] = None
+        self.recovered_count: int = 0
+
+    @property
+    def annotations(self) -> List[Annotation]:
+        """All annotations. Hydrates every page still pending from a lazy load."""
+        if self._unhydrated:
+            self._hydrate_all()
+        return self._annotations
+
+    @annotations.setter
+    def annotations(self, value: List[Annotation]):
+        self._annotations = value
+        self._unhydrated = {}
+        self._invalidate_snapshot()
 
     @property
     def is_dirty(self):
@@ -54,81 +198,102 @@ class AnnotationStore:
 
     @is_dirty.setter
     def is_dirty(self, value: bool):
+        if self._batch_depth:
+            self._batch_dirty = value
+            return
         print(f"DEBUG: is_dirty changed to {value}")
         self._is_dirty = value
         if self.on_dirty_changed:
             self.on_dirty_changed(value)
         
     def get_fingerprint(self, pdf_path: str) -> str:
-        """Generates a simple fingerprint for the PDF file."""
-        import hashlib
+        """Content fingerprint (SHA-256) of the PDF, cached per file stat."""
         try:
-            stat = os.stat(pdf_path)
-            with open(pdf_path, 'rb') as f:
-                header = f.read(4096) # Read first 4KB
-            
-            hasher = hashlib.md5()
-            hasher.update(str(stat.st_size).encode('utf-8'))
-            hasher.update(str(stat.st_mtime).encode('utf-8'))
-            hasher.update(header)
-            return hasher.hexdigest()
+            return fingerprint.get_fingerprint(pdf_path)
         except Exception as e:
             print(f"Error generating fingerprint: {e}")
             return "unknown"
 
     def save_to_file(self, path: str, pdf_path: str):
-        """Saves project to a specific JSON file."""
-        fingerprint = self.get_fingerprint(pdf_path)
-        data = {
-            "format_version": 1,
-            "pdf_fingerprint": fingerprint,
-            "annotations": [asdict(ann) for ann in self.annotations]
-        }
-        
+        """Saves project to a specific file (binary for .pdfannot, JSON otherwise)."""
         try:
-            with open(path, 'w') as f:
-                json.dump(data, f, indent=2)
+            if self._can_journal(path):
+                self._flush_journal(path)
+            else:
+                self.write_project(path, self.get_fingerprint(pdf_path))
             print(f"Saved project to {path}")
+            if self._recovery_base is not None:
+                # The session runs on a project: this one is the new base
+                self._reset_recovery(path)
+            # Otherwise the log stays relative to the sidecar, which this didn't write
             self.is_dirty = False
         except Exception as e:
             print(f"Error saving project: {e}")
             raise e
 
-    def load_from_file(self, path: str, pdf_path: str) -> bool:
-        """Loads project from JSON. Returns False if fingerprint mismatch."""
-        if not os.path.exists(path):
-            return False
-            
-        try:
+    def write_project(self, path: str, fingerprint: str, binary: Optional[bool] = None):
+        """Writes a full project snapshot; by default the format follows the file extension."""
+        if binary is None:
+            binary = binary_format.is_binary_path(path)
+        if binary:
+            binary_format.write_project(path, self.annotations, fingerprint)
+            self._snapshot_written(path)
+        else:
+            data = {
+                "format_version": 1,
+                "pdf_fingerprint": fingerprint,
+                "annotations": [asdict(ann) for ann in self.annotations]
+            }
+            self._write_snapshot(path, data)
+
+    def read_project(self, path: str, lazy: bool = False) -> str:
+        """Reads a JSON or binary project plus its journal. Returns the saved fingerprint."""
+        if binary_format.is_binary_file(path):
+            project = binary_format.BinaryProject.open(path)
+            fingerprint = project.fingerprint
+            if lazy:
+                self._load_lazy(self._binary_page_loaders(project))
+            else:
+                self.annotations = project.read_all()
+        else:
             with open(path, 'r') as f:
                 data = json.load(f)
             
             # version check (future proofing)
             version = data.get("format_version", 1)
             
-            # fingerprint check
-            saved_fingerprint = data.get("pdf_fingerprint", "")
-            current_fingerprint = self.get_fingerprint(pdf_path)
+            fingerprint = data.get("pdf_fingerprint", "")
+            self._load_items(data.get('annotations', []), lazy)
+            
+        self._replay_journal(path)
+        return fingerprint
+
+    def load_from_file(self, path: str, pdf_path: str, lazy: bool = False) -> bool:
+        """Loads project (JSON or binary). Returns True if fingerprint mismatch."""
+        if not os.path.exists(path):
+            return False
             
+        try:
+            saved_fingerprint = self.read_project(path, lazy)
+            
+            # fingerprint check
             mismatch = False
-            if saved_fingerprint != current_fingerprint:
-                print(f"WARNING: Fingerprint mismatch! Saved: {saved_fingerprint}, Current: {current_fingerprint}")
+            try:
+                matched = fingerprint.matches(saved_fingerprint, pdf_path)
+            except Exception as e:
+                print(f"Error generating fingerprint: {e}")
+                matched = False
+            if not matched:
+                print(f"WARNING: Fingerprint mismatch! Saved: {saved_fingerprint}, Current: {self.get_fingerprint(pdf_path)}")
                 mismatch = True
                 
-            self.annotations = []
-            for item in data.get('annotations', []):
-                # Backwards compat: If ID missing, generate one
-                if 'id' not in item: item['id'] = str(uuid.uuid4())
-                
-                ann = Annotation(**item)
-                ann.color = tuple(ann.color)
-                ann.rects = [tuple(r) for r in ann.rects]
-                self.annotations.append(ann)
+            self._reset_recovery(path)
                 
             self._undo_stack.clear()
             self._redo_stack.clear()
             self.is_dirty = False
-            print(f"Loaded {len(self.annotations)} annotations from {path}")
+            print(f"Loaded {self._count_label()} from {path}")
+            self._notify('reset')
             
             return mismatch # Returns True if there was a mismatch (Warning needed)
             
@@ -136,178 +301,727 @@ class AnnotationStore:
             print(f"Error loading project: {e}")
             raise e
         
-    def load(self, pdf_path: str):
-        """Loads annotations from a sidecar JSON file (pdf_path + .json)."""
+    def load(self, pdf_path: str, recovery: bool = False, lazy: bool = False, strict: bool = False):
+        """
+        Loads annotations from a sidecar JSON file (pdf_path + .json).
+        With recovery=True, replays edits left unsaved by a crashed session
+        and keeps logging new ones. With lazy=True, Annotation objects are
+        only built for a page when it is first asked for. A sidecar that
+        can't be read leaves the store empty, or raises with strict=True
+        (batch tools must not treat it as "no annotations").
+        """
         self.file_path = pdf_path + ".json"
+        self.annotations = []
+        self._pending.clear()
+        self._journal_base = None
+        self.recovered_count = 0
         
-        if not os.path.exists(self.file_path):
-            self.annotations = []
-            return
-
-        try:
-            with open(self.file_path, 'r') as f:
-                data = json.load(f)
+        if os.path.exists(self.file_path) or \
+           os.path.exists(journal.journal_path(self.file_path)):
+            try:
+                if os.path.exists(self.file_path):
+                    self._sidecar_binary = binary_format.is_binary_file(self.file_path)
+                    self.read_project(self.file_path, lazy)
+                else:
+                    self._replay_journal(self.file_path)
+                    
+                print(f"Loaded {self._count_label()} from {self.file_path}")
                 
-            self.annotations = []
-            for item in data.get('annotations', []):
-                # Convert back to dataclass
-                ann = Annotation(**item)
-                # Ensure tuples for color/rects if JSON loaded lists
-                ann.color = tuple(ann.color)
-                ann.rects = [tuple(r) for r in ann.rects]
-                self.annotations.append(ann)
-                
-            print(f"Loaded {len(self.annotations)} annotations from {self.file_path}")
-            
-        except Exception as e:
-            print(f"Error loading annotations: {e}")
-            self.annotations = []
+            except Exception as e:
+                print(f"Error loading annotations: {e}")
+                self.annotations = []
+                if strict:
+                    raise
+
+        if recovery:
+            self._recover()
 
     def save(self):
         """Saves annotations to the sidecar JSON file."""
         if not self.file_path:
             return
 
-        data = {
-            "version": 1,
-            "annotations": [asdict(ann) for ann in self.annotations]
-        }
-        
         try:
-            with open(self.file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            if self._can_journal(self.file_path):
+                self._flush_journal(self.file_path)
+            elif self._sidecar_binary:
+                self.write_project(self.file_path, "", binary=True)
+            else:
+                data = {
+                    "version": 1,
+                    "annotations": [asdict(ann) for ann in self.annotations]
+                }
+                self._write_snapshot(self.file_path, data)
             print(f"Saved annotations to {self.file_path}")
+            self._truncate_recovery()
             self.is_dirty = False # Sidecar save clears dirty too? Requirement: "Set dirty = False after Save"
         except Exception as e:
             print(f"Error saving annotations: {e}")
 
+    # --- Lazy Hydration ---
+
+    def _load_items(self, items: List[dict], lazy: bool):
+        """
+        Loads JSON annotation dicts, eagerly or as a page -> record index.
+        JSON has no offset table, so the lazy form still parses the whole
+        file and only defers building Annotation objects; binary projects
+        are read per page.
+        """
+        if not lazy:
+            self.annotations = [Annotation.from_dict(item) for item in items]
+            return
+        positions: Dict[int, List[int]] = {}
+        for i, item in enumerate(items):
+            positions.setdefault(item.get('page_index', 0), []).append(i)
+        self._load_lazy({
+            page: (lambda idx=idx: [Annotation.from_dict(items[i]) for i in idx])
+            for page, idx in positions.items()
+        })
+
+    def _binary_page_loaders(self, project) -> Dict[int, Callable[[], List[Annotation]]]:
+        return {
+            page: (lambda first=first, count=count: project.read_records(first, count))
+            for page, (first, count) in project.pages.items()
+        }
+
+    def _load_lazy(self, loaders: Dict[int, Callable[[], List[Annotation]]]):
+        self._annotations = []
+        self._unhydrated = loaders
+        self._invalidate_snapshot()
+
+    def _hydrate_page(self, page_index: int):
+        loader = self._unhydrated.pop(page_index, None)
+        if loader:
+            loaded = loader()
+            self._annotations.extend(loaded)
+            if self._lazy_snapshots:
+                frozen = _frozen(loaded)
+                for snap in list(self._lazy_snapshots):
+                    snap._pin(page_index, frozen)
+            # Same content as the loader older snapshots hold, but now copied from memory
+            if self._snapshot_stale is not None:
+                self._snapshot_stale.add(page_index)
+
+    def _hydrate_all(self):
+        for page_index in sorted(self._unhydrated):
+            self._hydrate_page(page_index)
+
+    @property
+    def page_indices(self) -> List[int]:
+        """Sorted pages that have annotations. Does not hydrate lazy pages."""
+        return sorted({ann.page_index for ann in self._annotations} | set(self._unhydrated))
+
+    def _count_label(self) -> str:
+        if self._unhydrated:
+            return f"{len(self._unhydrated)} pages of annotations (lazy)"
+        return f"{len(self._annotations)} annotations"
+
+    # --- Journal ---
+
+    def _can_journal(self, path: str) -> bool:
+        """Pending changes can be appended only to the file they are relative to."""
+        return (self._journal_base == path
+                and os.path.exists(path)
+                and not journal.should_compact(path, self.journal_compact_ratio))
+
+    def _flush_journal(self, path: str):
+        """Appends pending changes to the journal. Cost is O(changes)."""
+        records = []
+        for annotation_id, (op, ann) in self._pending.items():
+            if op == 'remove':
+                records.append({"op": "remove", "id": annotation_id, "page_index": ann.page_index})
+            else:
+                records.append({"op": op, "annotation": asdict(ann)})
+        journal.append_records(path, records)
+        self._pending.clear()
+
+    def _write_snapshot(self, path: str, data: dict):
+        """Writes a full snapshot (compaction) and drops the now-folded journal."""
+        journal.write_json_atomic(path, data)
+        self._snapshot_written(path)
+
+    def _snapshot_written(self, path: str):
+        """A fresh snapshot at `path` folds in its journal and every pending change."""
+        journal.remove_journal(path)
+        self._pending.clear()
+        self._journal_base = path
+
+    def _replay_journal(self, path: str):
+        """Applies the journal of `path` on top of the loaded snapshot."""
+        self._pending.clear()
+        self._journal_base = path
+        records = journal.read_records(path)
+        if records:
+            self._apply_records(records)
+            print(f"Replayed {len(records)} journal records from {journal.journal_path(path)}")
+
+    def _apply_records(self, records: List[dict]):
+        """
+        Applies journal/recovery records. Records for pages that are still
+        lazy are attached to those pages' loaders and applied on hydration,
+        so replaying a journal doesn't load the whole project.
+        """
+        if self._unhydrated and any(rec.get("op") == "remove" and "page_index" not in rec
+                                    for rec in records):
+            # Removals logged before records carried their page: the id could be anywhere
+            self._hydrate_all()
+        if not self._unhydrated:
+            self.annotations = _apply_to(self._annotations, records)
+            return
+
+        in_memory, per_page = [], {}
+        for rec in records:
+            page_index = rec["page_index"] if rec.get("op") == "remove" else \
+                rec.get("annotation", {}).get("page_index")
+            if page_index in self._unhydrated:
+                per_page.setdefault(page_index, []).append(rec)
+            else:
+                in_memory.append(rec)
+        for page_index, page_records in per_page.items():
+            loader = self._unhydrated[page_index]
+            self._unhydrated[page_index] = lambda loader=loader, recs=page_records: _apply_to(loader(), recs)
+        if in_memory:
+            self._annotations = _apply_to(self._annotations, in_memory)
+        self._invalidate_snapshot()
+
+    # --- Crash Recovery ---
+
+    def _recover(self):
+        """Replays the recovery log of a session that ended without saving."""
+        if self._recovery:
+            self._recovery.close()
+        self._recovery = RecoveryLog(self._recovery_path())
+        self._recovery_base = None
+        records = self._recovery.read()
+        if not records:
+            return
+        if records[0].get("op") == "reset":
+            # Session was running on a project file rather than the sidecar
+            project = records[0].get("project")
+            self._recovery_base = project
+            if project and os.path.exists(project):
+                self.read_project(project, lazy=True)
+            else:
+                self.annotations = []
+            changes = records[1:]
+        else:
+            changes = records
+        if changes:
+            self._apply_records(changes)
+        # Restored edits are not in the journal's pending set; rewrite on next save
+        self._journal_base = None
+        self.recovered_count = len(records)
+        print(f"Recovered {len(records)} unsaved changes from {self._recovery.path}")
+        self.is_dirty = True
+
+    def _recovery_path(self) -> str:
+        return self.file_path + RECOVERY_SUFFIX
+
+    def _log_recovery(self, op: str, annotation: Annotation):
+        if not self._recovery:
+            return
+        if op == 'remove':
+            record = {"op": "remove", "id": annotation.id, "page_index": annotation.page_index}
+        else:
+            record = {"op": op, "annotation": asdict(annotation)}
+        if self._batch_depth:
+            self._batch_recovery.append(record)
+            return
+        try:
+            self._recovery.append(record)
+        except OSError as e:
+            print(f"Error writing recovery log: {e}")
+
+    def _truncate_recovery(self):
+        """Empties the log after the sidecar was saved; it is the base again."""
+        if self._recovery:
+            self._recovery.truncate()
+        self._recovery_base = None
+
+    def _reset_recovery(self, project_path: str):
+        """Restarts the log on top of a project that replaced the annotations."""
+        if not self._recovery:
+            return
+        self._recovery.truncate()
+        self._recovery_base = os.path.abspath(project_path)
+        try:
+            self._recovery.append({"op": "reset", "project": os.path.abspath(project_path)})
+        except OSError as e:
+            print(f"Error writing recovery log: {e}")
+
+    def discard_recovery(self):
+        """Drops the recovery log (changes discarded or document closed cleanly)."""
+        if self._recovery:
+            self._recovery.discard()
+
+    def _mark_pending(self, op: str, annotation: Annotation):
+        """Coalesces a change into the pending set ('add', 'modify' or 'remove')."""
+        self._log_recovery(op, annotation)
+        prev = self._pending.get(annotation.id)
+        prev_op = prev[0] if prev else None
+        if op == 'remove':
+            if prev_op == 'add':
+                # Never reached disk, nothing to journal
+                del self._pending[annotation.id]
+            else:
+                self._pending[annotation.id] = ('remove', annotation)
+        elif op == 'add':
+            self._pending[annotation.id] = ('modify' if prev_op == 'remove' else 'add', annotation)
+        else:
+            self._pending[annotation.id] = ('add' if prev_op == 'add' else 'modify', annotation)
+
+    def _find(self, annotation_id: str) -> Optional[Annotation]:
+        # Anything the UI touches lives on a hydrated page; only fall back to
+        # hydrating everything for unknown ids.
+        for ann in self._annotations:
+            if ann.id == annotation_id:
+                return ann
+        if self._unhydrated:
+            self._hydrate_all()
+            return self._find(annotation_id)
+        return None
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups mutations: one compound undo entry, one is_dirty update and one
+        change notification carrying all changes when the outermost batch exits.
+
+            with store.batch():
+                for ann in new_annotations:
+                    store.add(ann)
+
+        If the body raises, the batch's changes are rolled back before the
+        exception propagates, so the store is left as it was.
+        """
+        self._batch_depth += 1
+        start = len(self._batch_entries)
+        redo_stack = list(self._redo_stack)
+        try:
+            yield self
+        except BaseException:
+            self._rollback_batch(start)
+            self._redo_stack = redo_stack
+            raise
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._end_batch()
+
+    def _rollback_batch(self, start: int):
+        """Undoes the undo entries recorded since index `start` of the open batch."""
+        entries = self._batch_entries[start:]
+        del self._batch_entries[start:]
+        if not entries:
+            return
+        outer = self._deferred_removals
+        if outer is None:
+            self._deferred_removals = set()
+        try:
+            for entry in reversed(entries):
+                self._apply_entry(entry, undo=True)
+        finally:
+            if outer is None:
+                self._flush_removals()
+                self._deferred_removals = None
+        print(f"DEBUG: Batch failed, rolled back {len(entries)} changes")
+
+    def _end_batch(self):
+        entries, self._batch_entries = self._batch_entries, []
+        changes, self._batch_changes = self._batch_changes, []
+        dirty, self._batch_dirty = self._batch_dirty, None
+        records, self._batch_recovery = self._batch_recovery, []
+        if records and self._recovery:
+            try:
+                self._recovery.append_many(records)
+            except OSError as e:
+                print(f"Error writing recovery log: {e}")
+        if len(entries) == 1:
+            self._push_undo(entries[0])
+        elif entries:
+            self._push_undo(('batch', entries))
+        if dirty is not None:
+            self.is_dirty = dirty
+        print(f"DEBUG: Batch finished: {len(entries)} undo entries, {len(changes)} changes")
+        if changes:
+            self._emit(changes)
+
+    def connect_changed(self, callback: Callable[[List[StoreChange]], None]) -> int:
+        """Registers callback(changes) for annotation changes. Returns a handler id."""
+        handler_id = self._next_listener_id
+        self._next_listener_id += 1
+        self._listeners[handler_id] = callback
+        return handler_id
+
+    def disconnect_changed(self, handler_id: int):
+        self._listeners.pop(handler_id, None)
+
+    def _notify(self, kind: str, ann: Optional[Annotation] = None, old_rects: Optional[list] = None):
+        self._invalidate_snapshot(ann.page_index if ann else None)
+        if ann is None:
+            change = StoreChange(kind)
+        else:
+            change = StoreChange(kind, ann.id, ann.page_index,
+                                 bbox_of(list(ann.rects or []) + list(old_rects or [])))
+        if self._batch_depth:
+            self._batch_changes.append(change)
+        else:
+            self._emit([change])
+
+    def _emit(self, changes: List[StoreChange]):
+        for callback in list(self._listeners.values()):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Error in change listener: {e}")
+
+    def snapshot(self) -> AnnotationSnapshot:
+        """
+        Immutable view of all annotations for background readers (export,
+        indexing). Call it on the main thread; only pages changed since the
+        last snapshot are copied again. Lazy pages are not hydrated here:
+        the snapshot takes their loaders and the reader loads them.
+        """
+        if self._snapshot is not None and self._snapshot.version == self._version:
+            return self._snapshot
+
+        stale_pages = self._snapshot_stale
+        if stale_pages is None or stale_pages:
+            stale: Dict[int, List[Annotation]] = {}
+            for ann in self._annotations:
+                if stale_pages is None or ann.page_index in stale_pages:
+                    stale.setdefault(ann.page_index, []).append(ann)
+            for page_index, anns in stale.items():
+                self._snapshot_pages[page_index] = _frozen(anns)
+        self._snapshot_stale = set()
+
+        # A page that lost its last annotation was invalidated and is simply absent
+        self._snapshot = AnnotationSnapshot(self._version, dict(self._snapshot_pages),
+                                            dict(self._unhydrated))
+        if self._unhydrated:
+            self._lazy_snapshots.add(self._snapshot)
+        return self._snapshot
+
+    def _invalidate_snapshot(self, page_index: Optional[int] = None):
+        self._version += 1
+        self._snapshot = None  # Stale now; let it go once no job uses it
+        if page_index is None:
+            self._snapshot_pages.clear()
+            self._snapshot_stale = None
+            self._hit_cache.clear()
+        else:
+            self._snapshot_pages.pop(page_index, None)
+            if self._snapshot_stale is not None:
+                self._snapshot_stale.add(page_index)
+            self._hit_cache.pop(page_index, None)
+
+    def invalidate_page(self, page_index: int):
+        """
+        Drops cached per-page data (snapshot, hit-test arrays) after an
+        in-memory geometry tweak that isn't an edit, e.g. a text box resized
+        to its laid-out text.
+        """
+        self._invalidate_snapshot(page_index)
+
+    def mark_modified(self, annotation_id: str):
+        """Records an in-place edit (e.g. text content) so the next save persists it."""
+        ann = self._find(annotation_id)
+        if ann:
+            self._mark_pending('modify', ann)
+            self.is_dirty = True
+            self._notify('modified', ann)
+
     def add(self, annotation: Annotation):
-        self.annotations.append(annotation)
+        # Hydrate first so existing annotations stay underneath the new one
+        self._hydrate_page(annotation.page_index)
+        self._annotations.append(annotation)
+        self._mark_pending('add', annotation)
         self.is_dirty = True
-        self._undo_stack.append(('add', annotation))  # Track for undo
-        self._redo_stack.clear()  # New action invalidates redo
-        print(f"DEBUG: Added annotation {annotation.id}, undo_stack now has {len(self._undo_stack)} items")
+        self._push_undo(('add', annotation))  # Track for undo
+        self._notify('added', annotation)
+        if not self._batch_depth:
+            print(f"DEBUG: Added annotation {annotation.id}, undo_stack now has {len(self._undo_stack)} items")
 
     def get_for_page(self, page_index: int) -> List[Annotation]:
-        return [a for a in self.annotations if a.page_index == page_index]
+        self._hydrate_page(page_index)
+        return [a for a in self._annotations if a.page_index == page_index]
     
     def remove(self, annotation_id: str):
+        ann = self._find(annotation_id)
+        if ann is None:
+            return
         removed = None
         new_list = []
-        for a in self.annotations:
+        for a in self._annotations:
             if a.id == annotation_id:
                 removed = a
             else:
                 new_list.append(a)
         
         if removed:
-            self._undo_stack.append(('remove', removed))  # Track as 'remove' operation
-            self._redo_stack.clear()  # New action invalidates redo history
-            self.annotations = new_list
+            self._push_undo(('remove', removed))  # Track as 'remove' operation
+            self._annotations = new_list
+            self._mark_pending('remove', removed)
             self.is_dirty = True
-            print(f"DEBUG: Removed annotation {removed.id}, undo_stack now has {len(self._undo_stack)} items")
+            self._notify('removed', removed)
+            if not self._batch_depth:
+                print(f"DEBUG: Removed annotation {removed.id}, undo_stack now has {len(self._undo_stack)} items")
             
     def record_modify(self, annotation_id: str, old_rects: list):
-        """Records a modification (rect change) for undo. Stores annotation ID and old rects."""
-        self._undo_stack.append(('modify', annotation_id, old_rects))
-        self._redo_stack.clear()  # New action invalidates redo
+        """
+        Records a modification (rect change) for undo. A pure translation is
+        stored as a ('move', id, dx, dy) delta instead of a copy of the old rects.
+        """
+        entry = ('modify', annotation_id, old_rects)
+        ann = self._find(annotation_id)
+        if ann:
+            delta = _rect_delta(old_rects, ann.rects)
+            if delta:
+                entry = ('move', annotation_id, delta[0], delta[1])
+            self._mark_pending('modify', ann)
+            self._notify('modified', ann, old_rects)
+        self._push_undo(entry, coalesce='rects')
         self.is_dirty = True
-        print(f"DEBUG: Recorded modify for {annotation_id}, undo_stack now has {len(self._undo_stack)} items")
-            
+        print(f"DEBUG: Recorded {entry[0]} for {annotation_id}, undo_stack now has {len(self._undo_stack)} items")
+
+    def record_text_edit(self, annotation_id: str, old_content: str):
+        """Records a text content change for undo; a typing run becomes one entry."""
+        ann = self._find(annotation_id)
+        if ann is None or ann.content == old_content:
+            return
+        self._mark_pending('modify', ann)
+        self._push_undo(('text', annotation_id, old_content), coalesce='text')
+        self.is_dirty = True
+        self._notify('modified', ann)
+
+    def _push_undo(self, entry: tuple, coalesce: Optional[str] = None):
+        """
+        Pushes an undo entry. Edits of the same kind on the same annotation
+        within coalesce_window seconds of each other merge into the top entry.
+        """
+        if self._batch_depth:
+            self._batch_entries.append(entry)
+            self._redo_stack.clear()
+            return
+        now = time.monotonic()
+        key = (coalesce, entry[1]) if coalesce else None
+        merged = None
+        if key and key == self._coalesce_key and self._undo_stack and \
+                now - self._coalesce_time <= self.coalesce_window:
+            merged = _merge_entries(self._undo_stack[-1], entry)
+        if merged:
+            self._undo_stack[-1] = merged
+        else:
+            self._undo_stack.append(entry)
+        self._coalesce_key = key
+        self._coalesce_time = now
+        self._redo_stack.clear()  # New action invalidates redo
+        self._trim_undo()
+
+    def _trim_undo(self):
+        """Drops the oldest entries beyond undo_limit entries / undo_rect_budget rects."""
+        excess = len(self._undo_stack) - self.undo_limit
+        cost = sum(_entry_cost(e) for e in self._undo_stack)
+        drop = 0
+        while drop < len(self._undo_stack) - 1 and (excess > 0 or cost > self.undo_rect_budget):
+            cost -= _entry_cost(self._undo_stack[drop])
+            excess -= 1
+            drop += 1
+        if drop:
+            del self._undo_stack[:drop]
+            print(f"DEBUG: Dropped {drop} oldest undo entries")
+
     def undo(self) -> Optional[tuple]:
-        """Undoes the last operation. Returns (operation, ...) or None."""
+        """
+        Undoes the last operation. Returns (operation, annotation), or
+        ('batch', pages) for a batch, or None.
+        """
         print(f"DEBUG: undo() called, undo_stack has {len(self._undo_stack)} items")
         if not self._undo_stack:
             print("DEBUG: undo_stack is empty, nothing to undo")
             return None
-        
-        entry = self._undo_stack.pop()
-        op = entry[0]
-        
-        if op == 'add':
-            ann = entry[1]
-            # Undo an add → remove the annotation
-            self.annotations = [a for a in self.annotations if a.id != ann.id]
-            print(f"DEBUG: Undid ADD - removed annotation {ann.id}")
-            self._redo_stack.append(entry)
-            self.is_dirty = True
-            return (op, ann)
-        elif op == 'remove':
-            ann = entry[1]
-            # Undo a remove → restore the annotation
-            self.annotations.append(ann)
-            print(f"DEBUG: Undid REMOVE - restored annotation {ann.id}")
-            self._redo_stack.append(entry)
-            self.is_dirty = True
-            return (op, ann)
-        elif op == 'modify':
-            annotation_id, old_rects = entry[1], entry[2]
-            # Find the annotation and swap rects
-            for ann in self.annotations:
-                if ann.id == annotation_id:
-                    current_rects = list(ann.rects) if ann.rects else []
-                    ann.rects = old_rects
-                    self._redo_stack.append(('modify', annotation_id, current_rects))
-                    print(f"DEBUG: Undid MODIFY - restored {len(old_rects)} rects for {annotation_id}")
-                    self.is_dirty = True
-                    return (op, ann)
-        return None
+        return self._step(self._undo_stack.pop(), self._redo_stack, undo=True)
 
     def redo(self) -> Optional[tuple]:
-        """Redoes the last undone operation. Returns (operation, ...) or None."""
+        """Redoes the last undone operation. Returns the same shapes as undo()."""
         print(f"DEBUG: redo() called, redo_stack has {len(self._redo_stack)} items")
         if not self._redo_stack:
             print("DEBUG: redo_stack is empty, nothing to redo")
             return None
-        
-        entry = self._redo_stack.pop()
+        return self._step(self._redo_stack.pop(), self._undo_stack, undo=False)
+
+    def _step(self, entry: tuple, other_stack: List[tuple], undo: bool) -> Optional[tuple]:
+        self._coalesce_key = None
+        if entry[0] == 'batch':
+            # Undo runs the sub-entries backwards; the inverse keeps forward order
+            pages: Set[int] = set()
+            inverses = []
+            with self.batch():  # One notification for the whole batch
+                # Removals are collected and applied in one pass, so undoing a
+                # bulk add stays linear
+                self._deferred_removals = set()
+                try:
+                    for sub in (reversed(entry[1]) if undo else entry[1]):
+                        inverse, ann = self._apply_entry(sub, undo)
+                        if inverse:
+                            inverses.append(inverse)
+                            pages.add(ann.page_index)
+                except BaseException:
+                    # Reverse what was applied and put the entry back, so
+                    # the history still matches the annotations
+                    for inverse in reversed(inverses):
+                        self._apply_entry(inverse, not undo)
+                    (self._undo_stack if undo else self._redo_stack).append(entry)
+                    raise
+                finally:
+                    self._flush_removals()
+                    self._deferred_removals = None
+            if undo:
+                inverses.reverse()
+            other_stack.append(('batch', inverses))
+            print(f"DEBUG: {'Undid' if undo else 'Redid'} BATCH of {len(inverses)} changes")
+            return ('batch', pages)
+
+        inverse, ann = self._apply_entry(entry, undo)
+        if inverse is None:
+            return None
+        other_stack.append(inverse)
+        print(f"DEBUG: {'Undid' if undo else 'Redid'} {entry[0].upper()} for {ann.id}")
+        return (entry[0], ann)
+
+    def _apply_entry(self, entry: tuple, undo: bool) -> Tuple[Optional[tuple], Optional[Annotation]]:
+        """Applies one history entry. Returns (entry for the other stack, annotation)."""
         op = entry[0]
-        
-        if op == 'add':
+        if op in ('add', 'remove'):
             ann = entry[1]
-            # Redo an add → add the annotation back
-            self.annotations.append(ann)
-            print(f"DEBUG: Redid ADD - added annotation {ann.id}")
-            self._undo_stack.append(entry)
-            self.is_dirty = True
-            return (op, ann)
-        elif op == 'remove':
-            ann = entry[1]
-            # Redo a remove → remove the annotation again
-            self.annotations = [a for a in self.annotations if a.id != ann.id]
-            print(f"DEBUG: Redid REMOVE - removed annotation {ann.id}")
-            self._undo_stack.append(entry)
+            # Undoing an add and redoing a remove both take the annotation out
+            if (op == 'add') == undo:
+                if self._deferred_removals is not None:
+                    self._deferred_removals.add(ann.id)
+                else:
+                    self._annotations = [a for a in self._annotations if a.id != ann.id]
+                self._mark_pending('remove', ann)
+                self._notify('removed', ann)
+            else:
+                if self._deferred_removals and ann.id in self._deferred_removals:
+                    self._flush_removals()  # Removed then re-added within one batch
+                self._hydrate_page(ann.page_index)
+                self._annotations.append(ann)
+                self._mark_pending('add', ann)
+                self._notify('added', ann)
             self.is_dirty = True
-            return (op, ann)
+            return entry, ann
+
+        if self._deferred_removals:
+            self._flush_removals()  # _find must not see removed annotations
+        annotation_id = entry[1]
+        ann = self._find(annotation_id)
+        if ann is None:
+            return None, None
+        old_rects = list(ann.rects or [])
+        if op == 'move':
+            # Deltas are their own inverse record: undo subtracts, redo adds
+            sign = -1 if undo else 1
+            ann.rects = translate_rects(ann.rects, sign * entry[2], sign * entry[3])
+            inverse = entry
         elif op == 'modify':
-            annotation_id, new_rects = entry[1], entry[2]
-            # Find the annotation and swap rects
-            for ann in self.annotations:
-                if ann.id == annotation_id:
-                    current_rects = list(ann.rects) if ann.rects else []
-                    ann.rects = new_rects
-                    self._undo_stack.append(('modify', annotation_id, current_rects))
-                    print(f"DEBUG: Redid MODIFY - applied {len(new_rects)} rects for {annotation_id}")
-                    self.is_dirty = True
-                    return (op, ann)
-        return None
+            inverse = ('modify', annotation_id, list(ann.rects) if ann.rects else [])
+            ann.rects = entry[2]
+        else:
+            inverse = ('text', annotation_id, ann.content)
+            ann.content = entry[2]
+        self._mark_pending('modify', ann)
+        self.is_dirty = True
+        self._notify('modified', ann, old_rects)
+        return inverse, ann
+
+    def _flush_removals(self):
+        if self._deferred_removals:
+            removed = self._deferred_removals
+            self._annotations = [a for a in self._annotations if a.id not in removed]
+            removed.clear()
 
     def find_annotation_at(self, page_index: int, x: float, y: float, tolerance: float = 5.0) -> Optional[Annotation]:
         """Finds the top-most annotation at the given PDF coordinates with tolerance."""
         print(f"DEBUG: find_annotation_at page={page_index}, x={x:.2f}, y={y:.2f}, tol={tolerance}")
-        # Iterate in reverse to find the one drawn on top
-        for ann in reversed(self.annotations):
-            if ann.page_index != page_index:
-                continue
-            
-            # Check rects
-            if not ann.rects: continue
-            for r in ann.rects:
-                # r is (x, y, w, h)
-                rx, ry, rw, rh = r
-                if (rx - tolerance) <= x <= (rx + rw + tolerance) and \
-                   (ry - tolerance) <= y <= (ry + rh + tolerance):
-                    print(f"DEBUG: HIT annotation {ann.id}")
-                    return ann
-        print("DEBUG: No annotation hit")
+        candidates, rects, owners = self._hit_arrays(page_index, x, y, tolerance)
+        # Rects are packed in draw order, so the last hit is the one on top
+        i = rects.last_hit(x, y, tolerance)
+        if i < 0:
+            print("DEBUG: No annotation hit")
+            return None
+        ann = candidates[owners[i]]
+        print(f"DEBUG: HIT annotation {ann.id}")
+        return ann
+
+    def _hit_candidates(self, page_index: int, x: float, y: float, tolerance: float) -> List[Annotation]:
+        """Annotations that may contain the point, in draw order."""
+        return self.get_for_page(page_index)
+
+    def _hit_arrays(self, page_index: int, x: float, y: float,
+                    tolerance: float) -> Tuple[List[Annotation], RectArray, List[int]]:
+        """The page's rects packed for hit testing; kept until the page changes."""
+        hit = self._hit_cache.get(page_index)
+        if hit is None:
+            candidates = [a for a in self._hit_candidates(page_index, x, y, tolerance) if a.rects]
+            rects, owners = pack_rect_lists([a.rects for a in candidates])
+            hit = self._hit_cache[page_index] = (candidates, rects, owners)
+        return hit
+
+def _apply_to(annotations: List[Annotation], records: List[dict]) -> List[Annotation]:
+    """annotations with journal records applied in order (upserts keep their slot)."""
+    index = {a.id: i for i, a in enumerate(annotations)}
+    slots: List[Optional[Annotation]] = list(annotations)
+    for rec in records:
+        op = rec.get("op")
+        if op == "remove":
+            i = index.pop(rec.get("id"), None)
+            if i is not None:
+                slots[i] = None
+        elif op in ("add", "modify"):
+            ann = Annotation.from_dict(rec["annotation"])
+            i = index.get(ann.id)
+            if i is None:
+                index[ann.id] = len(slots)
+                slots.append(ann)
+            else:
+                slots[i] = ann
+    return [a for a in slots if a is not None]
+
+def _rect_delta(old_rects, new_rects) -> Optional[Tuple[float, float]]:
+    """(dx, dy) if new_rects are old_rects translated by one offset, else None."""
+    if not old_rects or not new_rects or len(old_rects) != len(new_rects):
         return None
+    dx = new_rects[0][0] - old_rects[0][0]
+    dy = new_rects[0][1] - old_rects[0][1]
+    for o, n in zip(old_rects, new_rects):
+        if abs(n[0] - o[0] - dx) > 1e-9 or abs(n[1] - o[1] - dy) > 1e-9 or \
+           n[2] != o[2] or n[3] != o[3]:
+            return None
+    return (dx, dy)
+
+def _merge_entries(older: tuple, newer: tuple) -> Optional[tuple]:
+    """One entry that undoes both (newer was applied after older), or None."""
+    if older[1] != newer[1]:
+        return None
+    if older[0] in ('modify', 'text') and older[0] == newer[0]:
+        return older  # The older entry already holds the state to return to
+    if older[0] == 'modify' and newer[0] == 'move':
+        return older
+    if older[0] == 'move' and newer[0] == 'move':
+        return ('move', older[1], older[2] + newer[2], older[3] + newer[3])
+    if older[0] == 'move' and newer[0] == 'modify':
+        # Rects before the move = newer's old rects shifted back
+        dx, dy = older[2], older[3]
+        return ('modify', older[1], [(x - dx, y - dy, w, h) for x, y, w, h in newer[2]])
+    return None
+
+def _entry_cost(entry: tuple) -> int:
+    """Rough memory cost of an undo entry, in rects."""
+    if entry[0] == 'batch':
+        return sum(_entry_cost(e) for e in entry[1])
+    if entry[0] in ('add', 'remove'):
+        return 1 + len(entry[1].rects or [])
+    if entry[0] == 'modify':
+        return 1 + len(entry[2])
+    return 1
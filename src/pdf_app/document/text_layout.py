@@ -0,0 +1,139 @@
+import bisect
+import math
+from typing import List, Optional, Tuple
+
+import cairo
+
+# Per-page glyph boxes, extracted from Poppler once and kept for the page's
+# lifetime. Drag selection used to call Page.get_selected_region on every
+# motion event, which re-runs Poppler's text extraction each time; with the
+# boxes cached, a selection is a couple of bisects plus a walk over the
+# selected lines.
+#
+# Selection follows Poppler's GLYPH style: everything in reading order from
+# the glyph at the start point to the glyph at the end point, one rect per line.
+
+Rect = Tuple[float, float, float, float]  # (x, y, w, h) in PDF points
+
+class _Line:
+    __slots__ = ("top", "bottom", "left", "right", "start", "end", "centers")
+
+    def __init__(self, start: int):
+        self.top = math.inf
+        self.bottom = -math.inf
+        self.left = math.inf
+        self.right = -math.inf
+        self.start = start  # first glyph index
+        self.end = start    # one past the last glyph index
+        self.centers: List[float] = []
+
+class PageTextLayout:
+    """Glyph boxes of one page, grouped into lines in reading order."""
+
+    def __init__(self, text: str, boxes):
+        # boxes: one (x1, y1, x2, y2) per character of `text`, as returned by
+        # Page.get_text_layout(). Newlines only mark line breaks.
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self.lines: List[_Line] = []
+
+        line = None
+        for ch, (x1, y1, x2, y2) in zip(text, boxes):
+            if ch == '\n':
+                line = None
+                continue
+            cy = (y1 + y2) / 2
+            # Poppler doesn't always emit '\n' between columns/blocks: also break
+            # when the glyph isn't vertically inside the current line or jumps back
+            if line is not None and not (line.top <= cy <= line.bottom and x1 >= line.left):
+                line = None
+            if line is None:
+                line = _Line(len(self.boxes))
+                self.lines.append(line)
+            self.boxes.append((x1, y1, x2, y2))
+            line.end += 1
+            line.top = min(line.top, y1)
+            line.bottom = max(line.bottom, y2)
+            line.left = min(line.left, x1)
+            line.right = max(line.right, x2)
+            line.centers.append((x1 + x2) / 2)
+
+    @classmethod
+    def from_page(cls, page) -> "PageTextLayout":
+        text = page.get_text() or ""
+        try:
+            ok, rects = page.get_text_layout()
+        except Exception as e:
+            print(f"DEBUG: get_text_layout failed: {e}")
+            ok, rects = False, []
+        if not ok:
+            rects = []
+        return cls(text, [(r.x1, r.y1, r.x2, r.y2) for r in rects])
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _line_at(self, x: float, y: float, is_start: bool) -> Optional[int]:
+        # Line under the point; when between lines, the next line for the start
+        # point and the previous one for the end point, like Poppler.
+        best, best_dx = None, math.inf
+        for i, line in enumerate(self.lines):
+            if line.top <= y <= line.bottom:
+                dx = 0.0 if line.left <= x <= line.right else min(abs(x - line.left), abs(x - line.right))
+                if dx < best_dx:
+                    best, best_dx = i, dx
+        if best is not None:
+            return best
+
+        if is_start:
+            below = [i for i, line in enumerate(self.lines) if line.top > y]
+            return min(below, key=lambda i: (self.lines[i].top, i)) if below else None
+        above = [i for i, line in enumerate(self.lines) if line.bottom < y]
+        return max(above, key=lambda i: (self.lines[i].bottom, i)) if above else None
+
+    def _glyph_at(self, x: float, y: float, is_start: bool) -> Optional[int]:
+        li = self._line_at(x, y, is_start)
+        if li is None:
+            return None
+        line = self.lines[li]
+        if not (line.top <= y <= line.bottom):
+            # Point is above/below this line: take all of it
+            return line.start if is_start else line.end - 1
+        # Glyphs whose center is past the point belong to the selection end
+        k = bisect.bisect_left(line.centers, x)
+        if is_start:
+            return line.start + min(k, len(line.centers) - 1)
+        return line.start + max(k - 1, 0)
+
+    def selected_rects(self, x1: float, y1: float, x2: float, y2: float) -> List[Rect]:
+        """
+        Selection from (x1, y1) to (x2, y2) (PDF points) as one (x, y, w, h) per
+        line, in reading order. [] when no glyph is selected.
+        """
+        if not self.boxes:
+            return []
+        first = self._glyph_at(x1, y1, True)
+        last = self._glyph_at(x2, y2, False)
+        if first is None or last is None or first > last:
+            return []
+
+        rects = []
+        for line in self.lines:
+            if line.end <= first:
+                continue
+            if line.start > last:
+                break
+            lo, hi = max(line.start, first), min(line.end - 1, last)
+            left = min(self.boxes[i][0] for i in range(lo, hi + 1))
+            right = max(self.boxes[i][2] for i in range(lo, hi + 1))
+            rects.append((left, line.top, right - left, line.bottom - line.top))
+        return rects
+
+    def selected_region(self, x1: float, y1: float, x2: float, y2: float,
+                        scale: float = 1.0) -> cairo.Region:
+        """Drop-in for Page.get_selected_region(scale, GLYPH, rect): integer rects scaled by `scale`."""
+        region = cairo.Region()
+        for x, y, w, h in self.selected_rects(x1, y1, x2, y2):
+            left, top = math.floor(x * scale), math.floor(y * scale)
+            right, bottom = math.ceil((x + w) * scale), math.ceil((y + h) * scale)
+            region.union(cairo.RectangleInt(left, top, right - left, bottom - top))
+        return region
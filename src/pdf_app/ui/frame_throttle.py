@@ -0,0 +1,55 @@
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, GLib
+
+class FrameThrottle:
+    """
+    Coalesces high-rate input (drag motion) to the widget's frame clock.
+
+    schedule(*args) only remembers the latest arguments; callback(*args) runs
+    once in the next frame's tick, so several motion events per frame cost one
+    selection computation and one redraw. On drag end, apply the final
+    position synchronously (flush(), or cancel() and call it directly).
+    """
+
+    def __init__(self, widget: Gtk.Widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self._args = None
+        self._tick_id = 0
+
+    @property
+    def pending(self) -> bool:
+        return self._args is not None
+
+    def schedule(self, *args):
+        self._args = args
+        if self._tick_id:
+            return
+        if not self.widget.get_mapped():
+            # Tick callbacks only fire for mapped widgets
+            self.flush()
+            return
+        self._tick_id = self.widget.add_tick_callback(self._on_tick)
+
+    def _on_tick(self, widget, frame_clock):
+        self._tick_id = 0
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Runs the pending update now, if any."""
+        self._remove_tick()
+        args, self._args = self._args, None
+        if args is not None:
+            self.callback(*args)
+
+    def cancel(self):
+        """Drops the pending update."""
+        self._remove_tick()
+        self._args = None
+
+    def _remove_tick(self):
+        if self._tick_id:
+            self.widget.remove_tick_callback(self._tick_id)
+            self._tick_id = 0
@@ -0,0 +1,61 @@
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk
+
+class JobBar(Gtk.Revealer):
+    """Bottom bar showing a background job's progress with a Cancel button."""
+
+    def __init__(self):
+        super().__init__()
+        self.set_transition_type(Gtk.RevealerTransitionType.SLIDE_UP)
+        self.job = None
+
+        box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        box.set_margin_top(6)
+        box.set_margin_bottom(6)
+        box.set_margin_start(12)
+        box.set_margin_end(12)
+        self.set_child(box)
+
+        self.label = Gtk.Label()
+        box.append(self.label)
+
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_hexpand(True)
+        self.progress_bar.set_valign(Gtk.Align.CENTER)
+        self.progress_bar.set_show_text(True)
+        box.append(self.progress_bar)
+
+        self.btn_cancel = Gtk.Button(label="Cancel")
+        self.btn_cancel.connect("clicked", self.on_cancel_clicked)
+        box.append(self.btn_cancel)
+
+    @property
+    def busy(self) -> bool:
+        return self.job is not None
+
+    def track(self, job, title: str):
+        """Shows the bar for `job` (a BackgroundJob) until finish() is called."""
+        self.job = job
+        self.label.set_text(title)
+        self.progress_bar.set_fraction(0.0)
+        self.progress_bar.set_text("Starting…")
+        self.btn_cancel.set_sensitive(True)
+        self.set_reveal_child(True)
+
+    def update(self, done: int, total: int):
+        if total > 0:
+            self.progress_bar.set_fraction(done / total)
+            self.progress_bar.set_text(f"{done} / {total}")
+        else:
+            self.progress_bar.pulse()
+
+    def finish(self):
+        self.job = None
+        self.set_reveal_child(False)
+
+    def on_cancel_clicked(self, btn):
+        if self.job:
+            self.job.cancel()
+            self.btn_cancel.set_sensitive(False)
+            self.progress_bar.set_text("Cancelling…")
@@ -1,14 +1,15 @@
 import cairo
 import gi
 gi.require_version('Gtk', '4.0')
-gi.require_version('Poppler', '0.18')
-from gi.repository import Gtk, Gdk, Poppler
+from gi.repository import Gtk, Gdk
 
 from pdf_app.document.render import render_page_to_surface
 from pdf_app.document.store import Annotation, AnnotationStore
 from pdf_app.ui.text_dialog import TextAnnotationDialog
 
 from pdf_app.ui.pdf_drawing_area import PDFDrawingArea
+from pdf_app.ui.frame_throttle import FrameThrottle
+from pdf_app.utils.geometry import bbox_of, normalize_rects, scale_rects
 from pdf_app.ui.text_editor import TextEditorPopover
 
 class PDFPageView(Gtk.Overlay):
@@ -37,6 +38,10 @@ class PDFPageView(Gtk.Overlay):
         # Initial sizing
         self.update_size()
         
+        # Drag motion is applied at most once per frame
+        self.selection_throttle = FrameThrottle(self.drawing_area, self.apply_selection_drag)
+        self.resize_throttle = FrameThrottle(self.drawing_area, self.drawing_area.handle_drag_update)
+        
         # Setup Gestures (Drag for text selection)
         self.setup_gestures_on_drawing_area()
         
@@ -123,8 +128,12 @@ class PDFPageView(Gtk.Overlay):
         # Don't invalidate surface - just queue redraw with existing surface scaled
         self.drawing_area.queue_draw()
 
-    def on_annotation_update(self, ann):
-        # Save store
+    def on_annotation_update(self, ann, old_content=None):
+        # Save store (text edits also go on the undo stack)
+        if old_content is not None:
+            self.store.record_text_edit(ann.id, old_content)
+        else:
+            self.store.mark_modified(ann.id)
         self.store.save()
 
     def on_click_pressed(self, gesture, n_press, x, y):
@@ -184,8 +193,11 @@ class PDFPageView(Gtk.Overlay):
         print(f"DEBUG: Opening editor for {ann.id}")
         self.editor_popover.popup()
         
-    def on_text_updated(self, ann):
-        self.drawing_area.queue_draw()
+    def on_text_updated(self, ann, old_content=None):
+        if old_content is not None:
+            self.store.record_text_edit(ann.id, old_content)
+        else:
+            self.store.mark_modified(ann.id)
         self.store.save()
 
     def on_key_pressed(self, controller, keyval, keycode, state):
@@ -210,9 +222,7 @@ class PDFPageView(Gtk.Overlay):
         if keyval == Gdk.KEY_Delete or keyval == Gdk.KEY_BackSpace:
             if self.drawing_area.selected_annotation:
                 ann = self.drawing_area.selected_annotation
-                self.store.remove(ann.id)
-                self.drawing_area.selected_annotation = None
-                self.drawing_area.queue_draw()
+                self.store.remove(ann.id) # PDFView clears the selection and redraws
                 return True
                 
         return False
@@ -220,8 +230,12 @@ class PDFPageView(Gtk.Overlay):
         # We need to iterate children of Fixed and update positions if Scale changed
         self.load_widgets() # Simplify by just reloading
 
-    def on_annotation_update(self, ann):
-        # Save store
+    def on_annotation_update(self, ann, old_content=None):
+        # Save store (text edits also go on the undo stack)
+        if old_content is not None:
+            self.store.record_text_edit(ann.id, old_content)
+        else:
+            self.store.mark_modified(ann.id)
         self.store.save()
 
     def on_resize_drag_begin(self, gesture, start_x, start_y):
@@ -260,9 +274,13 @@ class PDFPageView(Gtk.Overlay):
                  self.drawing_area.queue_draw()
 
     def on_resize_drag_update(self, gesture, offset_x, offset_y):
-        self.drawing_area.handle_drag_update(offset_x, offset_y)
+        self.resize_throttle.schedule(offset_x, offset_y)
 
     def on_resize_drag_end(self, gesture, offset_x, offset_y):
+        # Apply the final position before committing
+        self.resize_throttle.cancel()
+        if self.drawing_area._resizing_handle:
+            self.drawing_area.handle_drag_update(offset_x, offset_y)
         self.drawing_area.handle_drag_end(offset_x, offset_y)
 
     def on_click_pressed(self, gesture, n_press, x, y):
@@ -327,6 +345,7 @@ class PDFPageView(Gtk.Overlay):
             gesture.set_state(Gtk.EventSequenceState.DENIED)
             return
 
+        self.selection_throttle.cancel()
         self.drawing_area.selection_start = (start_x, start_y)
         self.drawing_area.selection_end = (start_x, start_y)
         self.drawing_area.selected_region = None
@@ -334,6 +353,11 @@ class PDFPageView(Gtk.Overlay):
         self.drawing_area.queue_draw()
 
     def on_drag_update(self, gesture, offset_x, offset_y):
+        if not self.drawing_area.selection_start:
+            return
+        self.selection_throttle.schedule(offset_x, offset_y)
+
+    def apply_selection_drag(self, offset_x, offset_y):
         if not self.drawing_area.selection_start:
             return
         start_x, start_y = self.drawing_area.selection_start
@@ -342,9 +366,10 @@ class PDFPageView(Gtk.Overlay):
         self.drawing_area.queue_draw()
 
     def on_drag_end(self, gesture, offset_x, offset_y):
+         self.selection_throttle.cancel()
          if not self.drawing_area.selection_start:
             return
-         self.on_drag_update(gesture, offset_x, offset_y)
+         self.apply_selection_drag(offset_x, offset_y)
          
          # Tool-First: Create Annotation immediately
          if self.current_tool in ['highlight', 'underline'] and self.drawing_area.selected_region:
@@ -367,12 +392,10 @@ class PDFPageView(Gtk.Overlay):
         rw, rh = abs(x1 - x2), abs(y1 - y2)
         
         pdf_scale = 1.0 / self.scale
-        rect = Poppler.Rectangle()
-        rect.x1, rect.y1 = rx * pdf_scale, ry * pdf_scale
-        rect.x2, rect.y2 = (rx + rw) * pdf_scale, (ry + rh) * pdf_scale
-        
-        self.drawing_area.selected_region = self.page.get_selected_region(
-            self.scale, Poppler.SelectionStyle.GLYPH, rect
+        # Computed from the cached glyph boxes; Poppler's get_selected_region
+        # re-extracted the page text on every motion event
+        self.drawing_area.selected_region = self.drawing_area.text_layout.selected_region(
+            rx * pdf_scale, ry * pdf_scale, (rx + rw) * pdf_scale, (ry + rh) * pdf_scale, self.scale
         )
 
     # Popover needs modification to use self.drawing_area as pointing target or similar
@@ -478,18 +501,9 @@ class PDFPageView(Gtk.Overlay):
     def show_popover_for_selection(self):
         # ... implementation adapting to drawing_area ...
         if not self.drawing_area.selected_region: return
-        region = self.drawing_area.selected_region
-        num_rects = region.num_rectangles()
-        if num_rects == 0: return
-        
-        min_x, min_y = float('inf'), float('inf')
-        max_x, max_y = float('-inf'), float('-inf')
-        for i in range(num_rects):
-            r = region.get_rectangle(i)
-            min_x = min(min_x, r.x)
-            min_y = min(min_y, r.y)
-            max_x = max(max_x, r.x + r.width)
-            max_y = max(max_y, r.y + r.height)
+        bbox = bbox_of(self.region_rects(self.drawing_area.selected_region))
+        if bbox is None: return
+        min_x, min_y, max_x, max_y = bbox
             
         rect = Gdk.Rectangle()
         rect.x = int(min_x)
@@ -500,15 +514,25 @@ class PDFPageView(Gtk.Overlay):
         self.popover.set_pointing_to(rect)
         self.popover.popup()
 
-    def create_annotation_from_selection(self, type):
-        # ... similar to before but updating drawing_area ...
-        if not self.drawing_area.selected_region: return
+    @staticmethod
+    def region_rects(region):
+        """cairo.Region -> [(x, y, w, h)]"""
         rects = []
-        region = self.drawing_area.selected_region
-        scale_factor = 1.0 / self.scale
         for i in range(region.num_rectangles()):
             r = region.get_rectangle(i)
-            rects.append((r.x * scale_factor, r.y * scale_factor, r.width * scale_factor, r.height * scale_factor))
+            rects.append((r.x, r.y, r.width, r.height))
+        return rects
+
+    def create_annotation_from_selection(self, type):
+        # ... similar to before but updating drawing_area ...
+        if not self.drawing_area.selected_region: return
+        # Region rects are in widget pixels
+        rects = scale_rects(self.region_rects(self.drawing_area.selected_region), 1.0 / self.scale)
+        # One rect per line run instead of one per glyph run
+        merged = normalize_rects(rects)
+        print(f"DEBUG: Normalized selection {len(rects)} -> {len(merged)} rects")
+        if not merged: return
+        rects = merged
             
         color = (1, 1, 0, 0.4) if type == 'highlight' else (1, 0, 0, 1)
         ann = Annotation.create(type=type, page_index=self.page_number, rects=rects, color=color)
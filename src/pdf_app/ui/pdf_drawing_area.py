@@ -1,11 +1,14 @@
+import dataclasses
+
 import cairo
 import gi
 gi.require_version('Gtk', '4.0')
-gi.require_version('Pango', '1.0')
-gi.require_version('PangoCairo', '1.0')
-from gi.repository import Gtk, Gdk, Pango, PangoCairo
+from gi.repository import Gtk, Gdk
 
 from pdf_app.document.render import render_page_to_surface
+from pdf_app.document.painter import AnnotationPainter
+from pdf_app.document.text_layout import PageTextLayout
+from pdf_app.utils.geometry import normalize_rects, rects_contain, translate_rects
 
 class PDFDrawingArea(Gtk.DrawingArea):
     """
@@ -18,6 +21,7 @@ class PDFDrawingArea(Gtk.DrawingArea):
         self.scale = scale
         self.store = store
         self.surface = None
+        self.painter = AnnotationPainter() # Shared with the exporters
         
         self.set_focusable(True) # Allow focus to be grabbed
         self.set_can_target(True) # Allow events (focus)
@@ -27,14 +31,23 @@ class PDFDrawingArea(Gtk.DrawingArea):
         self.selection_start = None
         self.selection_end = None
         self.selected_region = None
+        self._text_layout = None # Glyph boxes, extracted on first selection
         
         self.selected_annotation = None # For Highlights/Underlines
         
+        # Search highlights, PDF points (set by PDFView)
+        self.search_rects = []
+        self.search_current = []
+        
         # Handle Resize State
         self._resizing_handle = None  # 'start' or 'end' when dragging
         self._resize_start_pos = None  # Initial drag position
         self.handle_radius = 12  # Larger radius for easier clicking
         self._old_rects = None  # Store original rects for undo
+        # Drag preview: the store is only touched in handle_drag_end
+        self._preview_offset = None  # (dx, dy) in PDF points while moving
+        self._preview_rects = None  # New rects while resizing
+        self._drag_base = None  # Page + all other annotations, painted once per drag
         
         # Click Gesture REMOVED - Managed by Parent (PDFPageView)
         # click = Gtk.GestureClick()
@@ -48,8 +61,17 @@ class PDFDrawingArea(Gtk.DrawingArea):
     def update_scale(self, scale):
         self.scale = scale
         self.surface = None
+        self._drag_base = None
         self.queue_draw()
 
+    @property
+    def text_layout(self) -> PageTextLayout:
+        """Cached glyph boxes of this page; doesn't depend on the zoom."""
+        if self._text_layout is None:
+            self._text_layout = PageTextLayout.from_page(self.page)
+            print(f"DEBUG: Cached text layout for page {self.page.get_index()} ({len(self._text_layout)} glyphs)")
+        return self._text_layout
+
     # def on_click(self, gesture, n_press, x, y):
         #     # REMOVED: Handled by PDFPageView
         #     pass
@@ -134,21 +156,19 @@ class PDFDrawingArea(Gtk.DrawingArea):
         pdf_x = start_x / self.scale
         pdf_y = start_y / self.scale
         # Check if point inside any rect
-        for r in ann.rects:
-            # r is (x, y, w, h)
-            if r[0] <= pdf_x <= r[0] + r[2] and r[1] <= pdf_y <= r[1] + r[3]:
-                self._resizing_handle = 'move'
-                self._resize_start_pos = (start_x, start_y)
-                self._old_rects = list(ann.rects) if ann.rects else []
-                cursor = Gdk.Cursor.new_from_name("move", None)
-                self.set_cursor(cursor)
-                print(f"DEBUG: Started MOVING annotation {ann.id}")
-                return True
+        if rects_contain(ann.rects, pdf_x, pdf_y):
+            self._resizing_handle = 'move'
+            self._resize_start_pos = (start_x, start_y)
+            self._old_rects = list(ann.rects)
+            cursor = Gdk.Cursor.new_from_name("move", None)
+            self.set_cursor(cursor)
+            print(f"DEBUG: Started MOVING annotation {ann.id}")
+            return True
                 
         return False
             
     def handle_drag_update(self, offset_x, offset_y):
-        """Update highlight during resize drag using Poppler text selection."""
+        """Update highlight during resize drag using the cached text layout."""
         if not self._resizing_handle or not self.selected_annotation:
             return
         
@@ -172,47 +192,21 @@ class PDFDrawingArea(Gtk.DrawingArea):
             dx = offset_x / self.scale
             dy = offset_y / self.scale
             
-            new_rects = []
-            for r in self._old_rects:
-                new_rects.append((r[0] + dx, r[1] + dy, r[2], r[3]))
-            
-            self.selected_annotation.rects = new_rects
+            # Preview only: drawn translated over the cached page
+            self._preview_offset = (dx, dy)
             self.queue_draw()
             return
 
         anchor_x, anchor_y = self._anchor_pdf
         
-        # Create selection rectangle from anchor to cursor
-        import gi
-        gi.require_version('Poppler', '0.18')
-        from gi.repository import Poppler
+        # Selection from anchor to cursor, from the cached glyph boxes
+        x1, y1 = min(pdf_x, anchor_x), min(pdf_y, anchor_y)
+        x2, y2 = max(pdf_x, anchor_x), max(pdf_y, anchor_y)
         
-        rect = Poppler.Rectangle()
-        # Always ensure x1 < x2 and y1 < y2
-        rect.x1 = min(pdf_x, anchor_x)
-        rect.y1 = min(pdf_y, anchor_y)
-        rect.x2 = max(pdf_x, anchor_x)
-        rect.y2 = max(pdf_y, anchor_y)
-        
-        print(f"DEBUG: Selection rect: ({rect.x1:.1f}, {rect.y1:.1f}) to ({rect.x2:.1f}, {rect.y2:.1f})")
-        
-        # Get text selection region from Poppler
         try:
-            region = self.page.get_selected_region(
-                1.0, Poppler.SelectionStyle.GLYPH, rect
-            )
-            
-            # Convert region to rects for annotation
-            if region and region.num_rectangles() > 0:
-                new_rects = []
-                for i in range(region.num_rectangles()):
-                    r = region.get_rectangle(i)
-                    # cairo.RectangleInt uses x, y, width, height
-                    new_rects.append((
-                        r.x, r.y, r.width, r.height
-                    ))
-                self.selected_annotation.rects = new_rects
-                print(f"DEBUG: Updated to {len(new_rects)} rects")
+            new_rects = self.text_layout.selected_rects(x1, y1, x2, y2)
+            if new_rects:
+                self._preview_rects = new_rects
             else:
                 print("DEBUG: No text in selection region")
         except Exception as e:
@@ -221,12 +215,21 @@ class PDFDrawingArea(Gtk.DrawingArea):
         self.queue_draw()
 
     def handle_drag_end(self, offset_x, offset_y):
-        """Finalize resize and save."""
-        if self._resizing_handle and self.selected_annotation and self._old_rects:
-            print(f"DEBUG: Finished resizing {self._resizing_handle} handle")
-            # Record the modification for undo (stores old rects)
-            self.store.record_modify(self.selected_annotation.id, self._old_rects)
+        """Commit the previewed geometry to the store, once per gesture."""
+        ann = self.selected_annotation
+        if self._resizing_handle and ann and self._old_rects:
+            new_rects = self._preview_geometry(ann)
+            if new_rects != self._old_rects:
+                print(f"DEBUG: Finished {self._resizing_handle} drag")
+                ann.rects = new_rects
+                # Record the modification for undo (stores old rects); this is the
+                # only change event of the gesture
+                self.store.record_modify(ann.id, self._old_rects)
             
+        self._preview_offset = None
+        self._preview_rects = None
+        self._drag_base = None
+        self.queue_draw()
         self._resizing_handle = None
         self._resize_start_pos = None
         self._anchor_pdf = None
@@ -234,11 +237,37 @@ class PDFDrawingArea(Gtk.DrawingArea):
         # Reset cursor to default
         self.set_cursor(None)
 
+    def _preview_geometry(self, ann):
+        """Rects of `ann` as currently previewed by a move/resize drag."""
+        if self._preview_offset:
+            return translate_rects(self._old_rects, *self._preview_offset)
+        if self._preview_rects:
+            return normalize_rects(self._preview_rects)
+        return list(ann.rects)
+
+    def _get_drag_base(self, dragged):
+        # Page with every annotation except the dragged one; each drag frame
+        # then only paints the preview on top
+        if self._drag_base is None:
+            self._drag_base = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                                 self.surface.get_width(), self.surface.get_height())
+            c = cairo.Context(self._drag_base)
+            c.set_source_surface(self.surface, 0, 0)
+            c.paint()
+            c.scale(self.scale, self.scale)
+            others = [a for a in self.store.get_for_page(self.page.get_index()) if a.id != dragged.id]
+            self.painter.paint(c, others, self._on_text_measured)
+        return self._drag_base
+
     def on_draw(self, area, c, width, height):
         # 1. Render Surface (PDF + Background)
         if self.surface is None:
             self.surface = render_page_to_surface(self.page, self.scale)
         
+        if self.selected_annotation and (self._preview_offset or self._preview_rects):
+            self.draw_drag_preview(c, self.selected_annotation)
+            return
+        
         c.set_source_surface(self.surface, 0, 0)
         c.paint()
         
@@ -265,28 +294,19 @@ class PDFDrawingArea(Gtk.DrawingArea):
             
             c.save()
             c.scale(self.scale, self.scale) 
-            
-            for ann in annotations:
-                r, g, b, a = ann.color
-                c.set_source_rgba(r, g, b, a)
-                
-                if ann.type == 'highlight':
-                    for rect in ann.rects:
-                        x, y, w, h = rect
+            self.painter.paint(c, annotations, self._on_text_measured)
+            c.restore()
+
+        # Search Matches (current one stronger)
+        if self.search_rects or self.search_current:
+            c.save()
+            c.scale(self.scale, self.scale)
+            for rects, alpha in ((self.search_rects, 0.3), (self.search_current, 0.6)):
+                if rects:
+                    c.set_source_rgba(1.0, 0.55, 0.0, alpha)
+                    for x, y, w, h in rects:
                         c.rectangle(x, y, w, h)
-                        c.fill()
-                        
-                elif ann.type == 'underline':
-                    c.set_line_width(1.0)
-                    for rect in ann.rects:
-                        x, y, w, h = rect
-                        c.move_to(x, y + h)
-                        c.line_to(x + w, y + h)
-                        c.stroke()
-                
-                elif ann.type == 'text':
-                    self.draw_text_annotation(c, ann)
-    
+                    c.fill()
             c.restore()
 
         # 3. Draw Selection Overlay (Text Selection)
@@ -307,49 +327,29 @@ class PDFDrawingArea(Gtk.DrawingArea):
         if self.selected_annotation:
             self.draw_annotation_selection(c, self.selected_annotation)
 
-    def draw_text_annotation(self, c, ann):
-        if not ann.rects:
-            return
-            
+    def draw_drag_preview(self, c, ann):
+        c.set_source_surface(self._get_drag_base(ann), 0, 0)
+        c.paint()
+
+        c.save()
+        c.scale(self.scale, self.scale)
+        if self._preview_offset:
+            # Move: same annotation, translated
+            c.translate(*self._preview_offset)
+            self.painter.paint(c, [ann])
+        else:
+            self.painter.paint(c, [dataclasses.replace(ann, rects=self._preview_rects)])
+        c.restore()
+
+        self.draw_annotation_selection(c, dataclasses.replace(ann, rects=self._preview_geometry(ann)))
+
+    def _on_text_measured(self, ann, text_w, text_h):
+        # Keep the text box the size of its laid-out text so hit-testing matches.
+        # Memory only; saving on every draw would be far too much IO.
         x, y, w, h = ann.rects[0]
-        
-        # Create Layout
-        layout = PangoCairo.create_layout(c)
-        layout.set_text(ann.content, -1)
-        
-        # Font Style (Naive parsing for now)
-        font_desc = Pango.FontDescription("Sans 12")
-        # Scale handling: font size 12 matches 12 points in PDF if scale is handled by cairo
-        layout.set_font_description(font_desc)
-        
-        # Position
-        c.move_to(x, y)
-        
-        # Draw
-        PangoCairo.show_layout(c, layout)
-        
-        # Update rect size if needed (e.g. 0x0 or changed)
-        # Get logical size in Pango units
-        _ink, logical = layout.get_extents()
-        # Convert to PDF units (unscale)
-        # Note: 'logical' is in Pango units (1/1024), convert to pixels then unscale?
-        # PangoCairo context is scaled. Pango units -> Screen Pixels.
-        # Screen Pixels / self.scale -> PDF units.
-        
-        pixel_w = logical.width / Pango.SCALE
-        pixel_h = logical.height / Pango.SCALE
-        
-        current_w = w
-        current_h = h
-        
-        # Check if size needs update in store (e.g. if it was 0 or content changed)
-        # Tolerance for float comparison
-        if abs(pixel_w - current_w) > 1.0 or abs(pixel_h - current_h) > 1.0:
-            # Update rects
-            # Note: This modifies the annotation in memory. 
-            # We don't save to disk on every draw to avoid heavy IO.
-            # But it ensures hit-testing uses the visual size.
-            ann.rects[0] = (x, y, pixel_w, pixel_h)
+        if abs(text_w - w) > 1.0 or abs(text_h - h) > 1.0:
+            ann.rects[0] = (x, y, text_w, text_h)
+            self.store.invalidate_page(ann.page_index) # Hit-test arrays are cached per page
 
     def draw_annotation_selection(self, c, ann):
         """Draw handles for selected annotation."""
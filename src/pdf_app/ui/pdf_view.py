@@ -5,6 +5,10 @@ from gi.repository import Gtk, Adw, GLib, Gdk, GObject
 from pdf_app.document.loading import load_document
 from pdf_app.ui.page_view import PDFPageView
 from pdf_app.document.store import AnnotationStore
+from pdf_app.document.sqlite_store import SQLiteAnnotationStore
+from pdf_app.document import fingerprint
+from pdf_app.document.search_index import get_search_index
+from pdf_app.utils.jobs import BackgroundJob
 
 class PDFView(Gtk.ScrolledWindow):
     """
@@ -13,7 +17,9 @@ class PDFView(Gtk.ScrolledWindow):
     """
     __gsignals__ = {
         'page-changed': (GObject.SignalFlags.RUN_FIRST, None, (int,)),
-        'zoom-changed': (GObject.SignalFlags.RUN_FIRST, None, (float,)) 
+        'zoom-changed': (GObject.SignalFlags.RUN_FIRST, None, (float,)),
+        'search-index-progress': (GObject.SignalFlags.RUN_FIRST, None, (int, int)),
+        'search-index-ready': (GObject.SignalFlags.RUN_FIRST, None, ()),
     }
 
     def __init__(self, file):
@@ -58,6 +64,12 @@ class PDFView(Gtk.ScrolledWindow):
         self.pages = [] # Track page instances
         self.current_page_index = 0
         
+        # Full-text search (index built in the background after load)
+        self.search_index = None
+        self.search_index_error = None
+        self._index_job = None
+        self._search_pages = set() # Pages currently showing search highlights
+        
         # Per-tab Sidebar instance
         self.sidebar = None # Will be created by window or here?
         # Let's create it later or allow window to assign it.
@@ -102,8 +114,14 @@ class PDFView(Gtk.ScrolledWindow):
                 self.show_error("Failed to load PDF.")
                 return
                 
-            # 2. Load Annotations
-            self.store.load(self.file.get_path())
+            # 2. Load Annotations (migrated documents live in <pdf>.annotations.db)
+            pdf_path = self.file.get_path()
+            if SQLiteAnnotationStore.exists_for(pdf_path):
+                self.store = SQLiteAnnotationStore()
+            self.store.load(pdf_path, recovery=True, lazy=True)
+            self.store.connect_changed(self.on_store_changed)
+            # Hash the PDF in the background so project saves/loads don't wait on it
+            fingerprint.warm(pdf_path)
 
             n_pages = self.document.get_n_pages()
             print(f"Loaded PDF with {n_pages} pages.")
@@ -119,6 +137,8 @@ class PDFView(Gtk.ScrolledWindow):
 
             # Set initial zoom to fit-to-width after layout
             GLib.idle_add(self._fit_to_width)
+            
+            self.start_search_indexing()
 
         except Exception as e:
             self.show_error(str(e))
@@ -172,6 +192,87 @@ class PDFView(Gtk.ScrolledWindow):
         if enabled:
             self.page_box.grab_focus()
 
+    def on_store_changed(self, changes):
+        """Redraws only the pages touched by a store change."""
+        dirty_pages = set()
+        for change in changes:
+            if change.kind == 'reset':
+                dirty_pages = set(range(len(self.pages)))
+                for page in self.pages:
+                    page.drawing_area.selected_annotation = None
+                break
+            if change.page_index is None or not (0 <= change.page_index < len(self.pages)):
+                continue
+            dirty_pages.add(change.page_index)
+            # Drop selection of an annotation that no longer exists (e.g. undone add)
+            area = self.pages[change.page_index].drawing_area
+            if change.kind == 'removed' and area.selected_annotation and \
+               area.selected_annotation.id == change.annotation_id:
+                area.selected_annotation = None
+
+        # GTK4 widgets have no partial invalidation (queue_draw_area is gone),
+        # and each page is its own drawing area, so the page is the unit we redraw.
+        for page_index in dirty_pages:
+            self.pages[page_index].drawing_area.queue_draw()
+        print(f"DEBUG: Store changed, redrawing pages {sorted(dirty_pages)}")
+
+    # ========== SEARCH ==========
+
+    def start_search_indexing(self):
+        """Loads the cached search index, or builds it on a worker thread."""
+        pdf_path = self.file.get_path()
+        self._index_job = BackgroundJob(
+            lambda progress, cancel: get_search_index(pdf_path, progress, cancel),
+            on_progress=lambda done, total: self.emit('search-index-progress', done, total),
+            on_done=self._on_search_index_done,
+            on_error=self._on_search_index_error,
+        ).start()
+
+    def cancel_search_indexing(self):
+        if self._index_job:
+            self._index_job.cancel()
+            self._index_job = None
+
+    def _on_search_index_done(self, index):
+        self._index_job = None
+        if index is None:
+            return  # Cancelled
+        self.search_index = index
+        print(f"DEBUG: Search index ready ({index.n_pages} pages)")
+        self.emit('search-index-ready')
+
+    def _on_search_index_error(self, error):
+        self._index_job = None
+        self.search_index_error = str(error)
+        self.emit('search-index-ready')
+
+    def show_search_hits(self, hits):
+        """Highlights all hits on their pages; [] clears."""
+        by_page = {}
+        for hit in hits:
+            by_page.setdefault(hit.page_index, []).extend(hit.rects)
+        for page_index in self._search_pages | set(by_page):
+            if 0 <= page_index < len(self.pages):
+                area = self.pages[page_index].drawing_area
+                area.search_rects = by_page.get(page_index, [])
+                area.search_current = []
+                area.queue_draw()
+        self._search_pages = set(by_page)
+
+    def reveal_search_hit(self, hit):
+        """Scrolls to the hit's page and emphasizes it."""
+        for page_index in self._search_pages:
+            area = self.pages[page_index].drawing_area
+            if area.search_current:
+                area.search_current = []
+                area.queue_draw()
+        if 0 <= hit.page_index < len(self.pages):
+            area = self.pages[hit.page_index].drawing_area
+            area.search_current = list(hit.rects)
+            area.queue_draw()
+            self._search_pages.add(hit.page_index)
+        self.scroll_to_page(hit.page_index)
+
     def reload_page(self, page_index: int):
         """Reloads widgets for a specific page after undo."""
         child = self.page_box.get_first_child()
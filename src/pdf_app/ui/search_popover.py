@@ -0,0 +1,169 @@
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, Gio, GObject, Pango
+
+from pdf_app.document.search_index import MAX_RESULTS
+
+class SearchResultItem(GObject.Object):
+    """List model item wrapping one SearchHit."""
+
+    def __init__(self, hit):
+        super().__init__()
+        self.hit = hit
+
+class SearchPopover(Gtk.Popover):
+    """
+    Search entry + virtualized result list for the current PDFView.
+
+    Queries run against view.search_index (see document/search_index.py), so
+    typing never touches Poppler. Results are shown as page highlights via
+    view.show_search_hits(); activating a row jumps to it. "Highlight All"
+    emits highlight-all(query) for the window to turn every match into an
+    annotation.
+    """
+    __gsignals__ = {
+        'highlight-all': (GObject.SignalFlags.RUN_FIRST, None, (str,)),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.view = None
+        self._view_handlers = []
+        self.hits = []
+        self.current = -1
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        box.set_margin_top(6)
+        box.set_margin_bottom(6)
+        box.set_margin_start(6)
+        box.set_margin_end(6)
+        self.set_child(box)
+
+        self.entry = Gtk.SearchEntry()
+        self.entry.set_placeholder_text("Find in document")
+        self.entry.connect("search-changed", self.on_search_changed)
+        self.entry.connect("activate", lambda entry: self.step(1))
+        self.entry.connect("next-match", lambda entry: self.step(1))
+        self.entry.connect("previous-match", lambda entry: self.step(-1))
+        box.append(self.entry)
+
+        self.btn_highlight_all = Gtk.Button(label="Highlight All")
+        self.btn_highlight_all.set_tooltip_text("Highlight every occurrence (one undo step)")
+        self.btn_highlight_all.set_sensitive(False)
+        self.btn_highlight_all.connect("clicked", self.on_highlight_all_clicked)
+        box.append(self.btn_highlight_all)
+
+        self.status = Gtk.Label(xalign=0)
+        self.status.add_css_class("dim-label")
+        box.append(self.status)
+
+        # ListView only creates rows for what's visible, so thousands of hits are fine
+        self.results = Gio.ListStore(item_type=SearchResultItem)
+        self.selection = Gtk.SingleSelection(model=self.results)
+        self.selection.set_autoselect(False)
+        self.selection.set_can_unselect(True)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_row_setup)
+        factory.connect("bind", self.on_row_bind)
+
+        self.list_view = Gtk.ListView(model=self.selection, factory=factory)
+        self.list_view.set_single_click_activate(True)
+        self.list_view.connect("activate", self.on_row_activated)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_min_content_width(360)
+        scrolled.set_min_content_height(320)
+        scrolled.set_child(self.list_view)
+        box.append(scrolled)
+
+        self.connect("show", lambda popover: self.entry.grab_focus())
+
+    # --- view ---
+
+    def set_view(self, view):
+        """Attaches to the PDFView of the selected tab (None for no document)."""
+        if self.view is not None:
+            for hid in self._view_handlers:
+                if self.view.handler_is_connected(hid):
+                    self.view.disconnect(hid)
+            self.view.show_search_hits([])
+        self._view_handlers = []
+        self.view = view
+        if view is not None:
+            self._view_handlers = [
+                view.connect('search-index-progress', self.on_index_progress),
+                view.connect('search-index-ready', self.on_index_ready),
+            ]
+        self.run_query()
+
+    def on_index_progress(self, view, done, total):
+        if self.entry.get_text().strip():
+            self.status.set_text(f"Indexing… {done} / {total} pages")
+
+    def on_index_ready(self, view):
+        self.run_query()
+
+    # --- query ---
+
+    def on_search_changed(self, entry):
+        # SearchEntry already debounces search-changed
+        self.run_query()
+
+    def on_highlight_all_clicked(self, btn):
+        query = self.entry.get_text().strip()
+        if query and self.view is not None:
+            self.popdown()
+            self.emit('highlight-all', query)
+
+    def run_query(self):
+        query = self.entry.get_text()
+        self.hits = []
+        self.current = -1
+        self.btn_highlight_all.set_sensitive(self.view is not None and bool(query.strip()))
+        if self.view is None:
+            self.status.set_text("No document")
+        elif not query.strip():
+            self.status.set_text("")
+        elif self.view.search_index_error:
+            self.status.set_text(f"Search unavailable: {self.view.search_index_error}")
+        elif self.view.search_index is None:
+            self.status.set_text("Indexing…")
+        else:
+            self.hits = self.view.search_index.search(query)
+            n = len(self.hits)
+            self.status.set_text("No matches" if not n else f"{n}{'+' if n >= MAX_RESULTS else ''} matches")
+
+        self.results.splice(0, self.results.get_n_items(), [SearchResultItem(h) for h in self.hits])
+        if self.view is not None:
+            self.view.show_search_hits(self.hits)
+
+    def step(self, delta):
+        """Jumps to the next/previous match."""
+        if not self.hits:
+            return
+        self.select(self.current + delta if self.current >= 0 else 0)
+
+    def select(self, position):
+        self.current = position % len(self.hits)
+        self.selection.set_selected(self.current)
+        if hasattr(self.list_view, 'scroll_to'):  # GTK 4.12+
+            self.list_view.scroll_to(self.current, Gtk.ListScrollFlags.NONE, None)
+        self.view.reveal_search_hit(self.hits[self.current])
+
+    # --- rows ---
+
+    def on_row_setup(self, factory, list_item):
+        label = Gtk.Label(xalign=0)
+        label.set_ellipsize(Pango.EllipsizeMode.END)
+        label.set_margin_top(4)
+        label.set_margin_bottom(4)
+        list_item.set_child(label)
+
+    def on_row_bind(self, factory, list_item):
+        hit = list_item.get_item().hit
+        list_item.get_child().set_text(f"p. {hit.page_index + 1}  {hit.snippet}")
+
+    def on_row_activated(self, list_view, position):
+        self.select(position)
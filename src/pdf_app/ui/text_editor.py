@@ -55,6 +55,7 @@ class TextEditorPopover(Gtk.Popover):
         
     def on_text_changed(self, buffer):
         text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
+        old_content = self.annotation.content
         self.annotation.content = text
         if self.on_update:
-            self.on_update(self.annotation)
+            self.on_update(self.annotation, old_content)
@@ -148,8 +148,9 @@ class TextWidget(Gtk.Overlay):
     def on_text_changed(self, buffer):
         start, end = buffer.get_bounds()
         text = buffer.get_text(start, end, True)
+        old_content = self.annotation.content
         self.annotation.content = text.strip()
-        self.on_update(self.annotation)
+        self.on_update(self.annotation, old_content)
 
     # --- Move Logic ---
     def on_drag_begin(self, gesture, x, y):
@@ -1,6 +1,20 @@
-import gi
-gi.require_version('Poppler', '0.18')
-from gi.repository import Poppler, Gdk
+from array import array
+from itertools import chain
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python fallback (array('d')) below
+    np = None
+
+# Geometry helpers. Nothing here needs GTK: the store and the exporters use it
+# too, so Poppler is only imported where a Poppler.Rectangle is built.
+
+RectTuple = Tuple[float, float, float, float]  # (x, y, w, h)
+BBox = Tuple[float, float, float, float]  # (x0, y0, x1, y1)
+
+# Below this many rects NumPy's per-call overhead costs more than it saves
+NUMPY_MIN_RECTS = 64
 
 class Rect:
     def __init__(self, x1, y1, x2, y2):
@@ -18,6 +32,9 @@ class Rect:
         return self.y2 - self.y1
 
     def to_poppler(self):
+        import gi
+        gi.require_version('Poppler', '0.18')
+        from gi.repository import Poppler
         r = Poppler.Rectangle()
         r.x1, r.y1, r.x2, r.y2 = self.x1, self.y1, self.x2, self.y2
         return r
@@ -28,3 +45,156 @@ class Rect:
 
     def contains(self, x, y):
         return self.x1 <= x <= self.x2 and self.y1 <= y <= self.y2
+
+class RectArray:
+    """
+    Packed (x, y, w, h) rects for bulk math: an (n, 4) float64 NumPy array,
+    or a flat array('d') when NumPy isn't installed (or the batch is small).
+    Operations return new arrays; indices refer to the input order.
+    """
+    __slots__ = ("data", "is_numpy")
+
+    def __init__(self, data, is_numpy: bool):
+        self.data = data
+        self.is_numpy = is_numpy
+
+    @classmethod
+    def from_rects(cls, rects: Sequence[Sequence[float]], use_numpy: Optional[bool] = None) -> "RectArray":
+        if use_numpy is None:
+            use_numpy = np is not None and len(rects) >= NUMPY_MIN_RECTS
+        if use_numpy and np is not None:
+            return cls(np.asarray(rects, dtype=np.float64).reshape(-1, 4), True)
+        return cls(array('d', chain.from_iterable(rects)), False)
+
+    def __len__(self) -> int:
+        return len(self.data) if self.is_numpy else len(self.data) // 4
+
+    def to_list(self) -> List[RectTuple]:
+        if self.is_numpy:
+            return list(map(tuple, self.data.tolist()))
+        d = self.data
+        return [(d[i], d[i + 1], d[i + 2], d[i + 3]) for i in range(0, len(d), 4)]
+
+    def translated(self, dx: float, dy: float) -> "RectArray":
+        if self.is_numpy:
+            data = self.data.copy()
+            data[:, 0] += dx
+            data[:, 1] += dy
+            return RectArray(data, True)
+        d = self.data
+        out = array('d', d)
+        for i in range(0, len(d), 4):
+            out[i] += dx
+            out[i + 1] += dy
+        return RectArray(out, False)
+
+    def scaled(self, factor: float) -> "RectArray":
+        if self.is_numpy:
+            return RectArray(self.data * factor, True)
+        return RectArray(array('d', (v * factor for v in self.data)), False)
+
+    def bbox(self) -> Optional[BBox]:
+        """Union bounding box (x0, y0, x1, y1), None when empty."""
+        if not len(self):
+            return None
+        if self.is_numpy:
+            d = self.data
+            return (float(d[:, 0].min()), float(d[:, 1].min()),
+                    float((d[:, 0] + d[:, 2]).max()), float((d[:, 1] + d[:, 3]).max()))
+        d = self.data
+        xs, ys = d[0::4], d[1::4]
+        return (min(xs), min(ys),
+                max(x + w for x, w in zip(xs, d[2::4])), max(y + h for y, h in zip(ys, d[3::4])))
+
+    def intersecting(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Indices of rects touching the box (x0, y0)-(x1, y1), edges inclusive."""
+        if self.is_numpy:
+            d = self.data
+            mask = (d[:, 0] <= x1) & (d[:, 0] + d[:, 2] >= x0) & (d[:, 1] <= y1) & (d[:, 1] + d[:, 3] >= y0)
+            return np.flatnonzero(mask).tolist()
+        d = self.data
+        return [i // 4 for i in range(0, len(d), 4)
+                if d[i] <= x1 and d[i] + d[i + 2] >= x0 and d[i + 1] <= y1 and d[i + 1] + d[i + 3] >= y0]
+
+    def hits(self, x: float, y: float, tolerance: float = 0.0) -> List[int]:
+        """Indices of rects containing the point, each rect grown by `tolerance`."""
+        return self.intersecting(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
+
+    def last_hit(self, x: float, y: float, tolerance: float = 0.0) -> int:
+        """Highest index containing the point (the top-most in draw order), or -1."""
+        if self.is_numpy:
+            found = self.hits(x, y, tolerance)
+            return found[-1] if found else -1
+        d = self.data
+        for i in range(len(d) - 4, -1, -4):
+            if d[i] - tolerance <= x <= d[i] + d[i + 2] + tolerance and \
+               d[i + 1] - tolerance <= y <= d[i + 1] + d[i + 3] + tolerance:
+                return i // 4
+        return -1
+
+    def contains_point(self, x: float, y: float, tolerance: float = 0.0) -> bool:
+        return self.last_hit(x, y, tolerance) >= 0
+
+def pack_rect_lists(rect_lists: Sequence[Sequence[Sequence[float]]]) -> Tuple[RectArray, List[int]]:
+    """Packs several rect lists (e.g. one per annotation) into one RectArray plus the owning list's index per rect."""
+    owners = [i for i, rects in enumerate(rect_lists) for _ in rects]
+    return RectArray.from_rects([r for rects in rect_lists for r in rects]), owners
+
+# Plain-list conveniences; small inputs take the pure-Python path
+
+def translate_rects(rects, dx: float, dy: float) -> List[RectTuple]:
+    return RectArray.from_rects(rects).translated(dx, dy).to_list()
+
+def scale_rects(rects, factor: float) -> List[RectTuple]:
+    return RectArray.from_rects(rects).scaled(factor).to_list()
+
+def bbox_of(rects) -> Optional[BBox]:
+    return RectArray.from_rects(rects).bbox() if rects else None
+
+def rects_contain(rects, x: float, y: float, tolerance: float = 0.0) -> bool:
+    return bool(rects) and RectArray.from_rects(rects).contains_point(x, y, tolerance)
+
+# Selection regions come back as many small rects (one per glyph run, plus
+# zero-width slivers at line ends). Annotations store the normalized form:
+# one rect per run of text on a line, all sharing that line's top/bottom.
+MIN_RECT_SIZE = 0.5      # PDF points; anything thinner is a sliver
+LINE_OVERLAP = 0.5       # Vertical overlap (of the smaller height) to count as one line
+MERGE_GAP = 0.6          # Horizontal gap, in line heights, still merged (word spaces)
+SNAP_DIGITS = 2          # Round coordinates to 1/100 pt
+
+def normalize_rects(rects, min_size: float = MIN_RECT_SIZE, merge_gap: float = MERGE_GAP):
+    """
+    (x, y, w, h) rects -> merged rects in reading order: slivers dropped,
+    same-line neighbours merged, each rect snapped to its line box.
+    """
+    rects = [tuple(r) for r in rects if r[2] >= min_size and r[3] >= min_size]
+    if not rects:
+        return []
+
+    # Group into lines, top to bottom
+    lines = []  # [top, bottom, [rects]]
+    for r in sorted(rects, key=lambda r: (r[1] + r[3] / 2, r[0])):
+        top, bottom = r[1], r[1] + r[3]
+        if lines:
+            line = lines[-1]
+            overlap = min(bottom, line[1]) - max(top, line[0])
+            if overlap >= LINE_OVERLAP * min(r[3], line[1] - line[0]):
+                line[0], line[1] = min(line[0], top), max(line[1], bottom)
+                line[2].append(r)
+                continue
+        lines.append([top, bottom, [r]])
+
+    result = []
+    for top, bottom, line_rects in lines:
+        max_gap = merge_gap * (bottom - top)
+        line_rects.sort(key=lambda r: r[0])
+        runs = []
+        for x, _y, w, _h in line_rects:
+            if runs and x <= runs[-1][1] + max_gap:
+                runs[-1][1] = max(runs[-1][1], x + w)
+            else:
+                runs.append([x, x + w])
+        y, h = round(top, SNAP_DIGITS), round(bottom - top, SNAP_DIGITS)
+        for x1, x2 in runs:
+            result.append((round(x1, SNAP_DIGITS), y, round(x2 - x1, SNAP_DIGITS), h))
+    return result
@@ -0,0 +1,65 @@
+import threading
+from typing import Callable, Optional
+
+from gi.repository import GLib
+
+class BackgroundJob:
+    """
+    Runs work(progress, cancel_event) on a worker thread.
+
+    `progress(done, total)` may be called from the worker; it is forwarded to
+    on_progress on the main loop. on_done(result) / on_error(exception) also run
+    on the main loop. The worker must not touch GTK widgets or the live store;
+    hand it a store snapshot instead.
+    """
+
+    def __init__(self, work: Callable, on_progress: Optional[Callable[[int, int], None]] = None,
+                 on_done: Optional[Callable] = None, on_error: Optional[Callable] = None):
+        self.work = work
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._progress_queued = False
+        self._latest = (0, 0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="job", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def _progress(self, done: int, total: int):
+        # Coalesce: at most one pending idle callback, it reports the latest value
+        self._latest = (done, total)
+        if not self._progress_queued and self.on_progress:
+            self._progress_queued = True
+            GLib.idle_add(self._deliver_progress)
+
+    def _deliver_progress(self):
+        self._progress_queued = False
+        self.on_progress(*self._latest)
+        return False
+
+    def _run(self):
+        try:
+            result = self.work(self._progress, self.cancel_event)
+        except Exception as e:
+            print(f"Error in background job: {e}")
+            if self.on_error:
+                GLib.idle_add(self._call, self.on_error, e)
+            return
+        if self.on_done:
+            GLib.idle_add(self._call, self.on_done, result)
+
+    @staticmethod
+    def _call(callback, arg):
+        callback(arg)
+        return False
@@ -1,3 +1,5 @@
+import os
+
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -6,6 +8,9 @@ from gi.repository import Gtk, Adw, Gio, GLib
 from pdf_app.ui.pdf_view import PDFView
 from pdf_app.ui.empty_view import EmptyView
 from pdf_app.ui.thumbnail_sidebar import ThumbnailSidebar
+from pdf_app.ui.job_bar import JobBar
+from pdf_app.ui.search_popover import SearchPopover
+from pdf_app.utils.jobs import BackgroundJob
 
 class MainWindow(Adw.ApplicationWindow):
     def __init__(self, *args, **kwargs):
@@ -59,6 +64,14 @@ class MainWindow(Adw.ApplicationWindow):
         # Add to Header (End)
         self.header_bar.pack_end(view_box)
         
+        # Search (Start)
+        self.search_popover = SearchPopover()
+        self.search_popover.connect('highlight-all', self.on_highlight_all)
+        self.btn_search = Gtk.MenuButton(icon_name="system-search-symbolic")
+        self.btn_search.set_tooltip_text("Find (Ctrl+F)")
+        self.btn_search.set_popover(self.search_popover)
+        self.header_bar.pack_start(self.btn_search)
+        
         self.header_bar.set_title_widget(title_box)
         
         # 3. Ribbon (Top Bar)
@@ -82,6 +95,10 @@ class MainWindow(Adw.ApplicationWindow):
         self.split_view.set_show_sidebar(False) # Default hidden
         
         self.toolbar_view.set_content(self.split_view)
+
+        # Background job progress (export etc.)
+        self.job_bar = JobBar()
+        self.toolbar_view.add_bottom_bar(self.job_bar)
         
         # 6. Sidebar (Dynamic per tab)
         # self.sidebar = ThumbnailSidebar() # REMOVED global
@@ -190,8 +207,25 @@ class MainWindow(Adw.ApplicationWindow):
         action_export = Gio.SimpleAction.new("export", None)
         action_export.connect("activate", self.on_export_pdf)
         self.add_action(action_export)
+
+        action_export_annotated = Gio.SimpleAction.new("export_annotated", None)
+        action_export_annotated.connect("activate", self.on_export_annotated_pdf)
+        self.add_action(action_export_annotated)
+        
+        action_export_images = Gio.SimpleAction.new("export_images", None)
+        action_export_images.connect("activate", self.on_export_images)
+        self.add_action(action_export_images)
+
+        action_export_digest = Gio.SimpleAction.new("export_digest", None)
+        action_export_digest.connect("activate", self.on_export_digest)
+        self.add_action(action_export_digest)
+        
+        action_search = Gio.SimpleAction.new("search", None)
+        action_search.connect("activate", self.on_search)
+        self.add_action(action_search)
         
         app.set_accels_for_action("win.save", ["<Ctrl>s"])
+        app.set_accels_for_action("win.search", ["<Ctrl>f"])
         app.set_accels_for_action("win.deselect", ["Escape"])
 
         # Deselect Action (Escape)
@@ -350,9 +384,24 @@ class MainWindow(Adw.ApplicationWindow):
         btn_export.set_tooltip_text("Export to PDF")
         btn_export.set_action_name("win.export")
         
+        btn_export_annotated = Gtk.Button(icon_name="document-send-symbolic")
+        btn_export_annotated.set_tooltip_text("Export with PDF Annotations")
+        btn_export_annotated.set_action_name("win.export_annotated")
+        
         box_file.append(btn_open)
         box_file.append(btn_save)
         box_file.append(btn_export)
+        box_file.append(btn_export_annotated)
+        
+        btn_export_images = Gtk.Button(icon_name="image-x-generic-symbolic")
+        btn_export_images.set_tooltip_text("Export Annotated Pages as PNG")
+        btn_export_images.set_action_name("win.export_images")
+        box_file.append(btn_export_images)
+
+        btn_export_digest = Gtk.Button(icon_name="x-office-document-symbolic")
+        btn_export_digest.set_tooltip_text("Export Highlighted Text (Markdown/CSV)")
+        btn_export_digest.set_action_name("win.export_digest")
+        box_file.append(btn_export_digest)
         
         ribbon_box.append(box_file)
         
@@ -421,10 +470,13 @@ class MainWindow(Adw.ApplicationWindow):
         view = selected.get_child()
         if isinstance(view, PDFView):
             result = view.store.undo()
+            # PDFView redraws the affected pages from the store's change events
             if result:
-                op, ann = result
-                print(f"DEBUG: Undone {op} on annotation {ann.id}, page {ann.page_index}")
-                view.reload_page(ann.page_index)
+                op, target = result
+                if op == 'batch':
+                    print(f"DEBUG: Undone batch on pages {sorted(target)}")
+                else:
+                    print(f"DEBUG: Undone {op} on annotation {target.id}, page {target.page_index}")
 
     def on_redo(self, action, param):
         """Redoes the last undone annotation operation."""
@@ -434,10 +486,13 @@ class MainWindow(Adw.ApplicationWindow):
         view = selected.get_child()
         if isinstance(view, PDFView):
             result = view.store.redo()
+            # PDFView redraws the affected pages from the store's change events
             if result:
-                op, ann = result
-                print(f"DEBUG: Redone {op} on annotation {ann.id}, page {ann.page_index}")
-                view.reload_page(ann.page_index)
+                op, target = result
+                if op == 'batch':
+                    print(f"DEBUG: Redone batch on pages {sorted(target)}")
+                else:
+                    print(f"DEBUG: Redone {op} on annotation {target.id}, page {target.page_index}")
 
     def add_empty_tab(self):
         """Adds a 'New Tab' page."""
@@ -466,6 +521,12 @@ class MainWindow(Adw.ApplicationWindow):
             
         pdf_view.store.on_dirty_changed = on_dirty_changed
         
+        # Edits restored from a crashed session are unsaved
+        if pdf_view.store.recovered_count:
+            self.update_tab_status(page, True)
+            toast = Adw.Toast.new(f"Restored {pdf_view.store.recovered_count} unsaved changes")
+            self.toolbar_view.add_toast(toast)
+        
         # 3. Select it
         self.tab_view.set_selected_page(page)
 
@@ -518,8 +579,88 @@ class MainWindow(Adw.ApplicationWindow):
             view.store.save()
             print(f"DEBUG: Saved annotations for {view.file.get_basename()}")
 
+    def on_search(self, action, param):
+        """Opens the find popover for the current document."""
+        if self.search_popover.view is not None:
+            self.btn_search.popup()
+
+    def on_highlight_all(self, popover, term):
+        """Highlights every occurrence of `term` in the current document as one undo step."""
+        from pdf_app.document.search_index import find_all
+        from pdf_app.document.store import Annotation
+        
+        if self.job_bar.busy:
+            self.toolbar_view.add_toast(Adw.Toast.new("Another job is already running"))
+            return
+        view = popover.view
+        if view is None: return
+        
+        # Worker: find matches (the index if it's ready, else Poppler find_text on its
+        # own document) and build the annotations; duplicates of existing highlights
+        # are skipped against a snapshot. The main thread only adds them.
+        snapshot = view.store.snapshot()
+        pdf_path = view.file.get_path()
+        index = view.search_index
+        
+        def work(progress, cancel):
+            existing = {(a.page_index, tuple(map(tuple, a.rects)))
+                        for a in snapshot.annotations if a.type == 'highlight'}
+            new = []
+            for page_index, rects in find_all(pdf_path, term, index, progress, cancel):
+                key = (page_index, tuple(rects))
+                if key in existing:
+                    continue
+                existing.add(key)
+                new.append(Annotation.create('highlight', page_index, list(rects)))
+            return None if cancel.is_set() else new
+        
+        def on_done(annotations):
+            self.job_bar.finish()
+            if annotations is None:
+                self.toolbar_view.add_toast(Adw.Toast.new("Highlight All Cancelled"))
+                return
+            if annotations:
+                # One undo step, one change notification, one save
+                with view.store.batch():
+                    for ann in annotations:
+                        view.store.add(ann)
+                view.store.save()
+            print(f"DEBUG: Highlight all '{term}': {len(annotations)} new highlights")
+            self.toolbar_view.add_toast(Adw.Toast.new(f"Highlighted {len(annotations)} occurrences of “{term}”"))
+        
+        def on_error(e):
+            self.job_bar.finish()
+            self.toolbar_view.add_toast(Adw.Toast.new("Highlight All Failed"))
+        
+        job = BackgroundJob(work, on_progress=self.job_bar.update, on_done=on_done, on_error=on_error)
+        self.job_bar.track(job, f"Highlighting “{term}”")
+        job.start()
+
     def on_export_pdf(self, action, param):
-        """Export to Flattened PDF."""
+        """Export to Flattened PDF (runs in the background)."""
+        from pdf_app.document.export import export_flattened_pdf
+        self._run_export(export_flattened_pdf, "Export PDF", "_flattened.pdf", page_choice=True)
+
+    def on_export_annotated_pdf(self, action, param):
+        """Export with native PDF annotations; page content is left untouched."""
+        from pdf_app.document.export import export_annotated_pdf
+        self._run_export(export_annotated_pdf, "Export PDF with Annotations", "_annotated.pdf")
+
+    def on_export_digest(self, action, param):
+        """Export the text under highlights (and notes) as Markdown, or CSV by extension."""
+        from pdf_app.document.digest import export_digest
+        self._run_export(export_digest, "Export Highlighted Text", "_highlights.md",
+                         filters=[("Markdown", "*.md"), ("CSV", "*.csv")])
+
+    def _run_export(self, exporter, title, suffix, page_choice=False, filters=None):
+        """
+        Asks for a path, then runs exporter(pdf, snapshot, path, progress, cancel) as a job.
+        page_choice adds an "all / annotated only / current page" selector to the dialog.
+        filters: [(name, glob)] for the dialog; PDF by default.
+        """
+        if self.job_bar.busy:
+            self.toolbar_view.add_toast(Adw.Toast.new("An export is already running"))
+            return
         selected_page = self.tab_view.get_selected_page()
         if not selected_page: return
         page = selected_page
@@ -527,20 +668,33 @@ class MainWindow(Adw.ApplicationWindow):
         if not hasattr(view, 'store'): return
         
         dialog = Gtk.FileChooserNative(
-            title="Export PDF",
+            title=title,
             transient_for=self,
             action=Gtk.FileChooserAction.SAVE
         )
         
-        filter_pdf = Gtk.FileFilter()
-        filter_pdf.set_name("PDF Documents")
-        filter_pdf.add_mime_type("application/pdf")
-        dialog.add_filter(filter_pdf)
+        if filters:
+            for name, pattern in filters:
+                file_filter = Gtk.FileFilter()
+                file_filter.set_name(name)
+                file_filter.add_pattern(pattern)
+                dialog.add_filter(file_filter)
+        else:
+            filter_pdf = Gtk.FileFilter()
+            filter_pdf.set_name("PDF Documents")
+            filter_pdf.add_mime_type("application/pdf")
+            dialog.add_filter(filter_pdf)
+        
+        if page_choice:
+            dialog.add_choice("pages", "Pages",
+                              ["all", "annotated", "current"],
+                              ["All pages", "Only pages with annotations", "Current page"])
+            dialog.set_choice("pages", "all")
         
         # Suggest filename: original_flattened.pdf
         try:
             orig_name = view.file.get_basename()
-            suggested = orig_name.replace(".pdf", "") + "_flattened.pdf"
+            suggested = orig_name.replace(".pdf", "") + suffix
             dialog.set_current_name(suggested)
         except: pass
         
@@ -549,21 +703,144 @@ class MainWindow(Adw.ApplicationWindow):
                 file = d.get_file()
                 path = file.get_path()
                 
-                from pdf_app.document.export import export_flattened_pdf
-                success = export_flattened_pdf(view.file.get_path(), view.store, path)
+                # The worker reads a snapshot (not the live store) and opens its own Poppler document
+                snapshot = view.store.snapshot()
+                pdf_path = view.file.get_path()
+                
+                options = {}
+                choice = d.get_choice("pages") if page_choice else None
+                if choice == "annotated":
+                    options["annotated_only"] = True
+                elif choice == "current":
+                    options["pages"] = [view.current_page_index]
                 
-                if success:
-                    print(f"Exported to {path}")
-                    toast = Adw.Toast.new(f"Exported to {file.get_basename()}")
+                def on_done(success):
+                    self.job_bar.finish()
+                    if success:
+                        print(f"Exported to {path}")
+                        toast = Adw.Toast.new(f"Exported to {file.get_basename()}")
+                    elif job.cancelled:
+                        toast = Adw.Toast.new("Export Cancelled")
+                    else:
+                        toast = Adw.Toast.new("Export Failed")
                     self.toolbar_view.add_toast(toast)
-                else:
-                    toast = Adw.Toast.new("Export Failed")
+                
+                job = BackgroundJob(
+                    lambda progress, cancel: exporter(pdf_path, snapshot, path, progress, cancel, **options),
+                    on_progress=self.job_bar.update,
+                    on_done=on_done,
+                    on_error=lambda e: on_done(False)
+                )
+                self.job_bar.track(job, f"Exporting {file.get_basename()}")
+                job.start()
+            d.destroy()
+            
+        dialog.connect("response", on_response)
+        dialog.show()
+
+    def on_export_images(self, action, param):
+        """Export annotated pages as PNGs or one multi-page TIFF into a folder, on a process pool."""
+        if self.job_bar.busy:
+            self.toolbar_view.add_toast(Adw.Toast.new("An export is already running"))
+            return
+        selected_page = self.tab_view.get_selected_page()
+        if not selected_page: return
+        view = selected_page.get_child()
+        if not hasattr(view, 'store'): return
+        
+        dialog = Gtk.FileChooserNative(
+            title="Export Page Images To",
+            transient_for=self,
+            action=Gtk.FileChooserAction.SELECT_FOLDER
+        )
+        from pdf_app.document.raster_export import DPI_CHOICES
+        dialog.add_choice("dpi", "Resolution",
+                          [str(dpi) for dpi in DPI_CHOICES], [f"{dpi} DPI" for dpi in DPI_CHOICES])
+        dialog.set_choice("dpi", "150")
+        dialog.add_choice("format", "Format", ["png", "tiff"],
+                          ["PNG per page", "Multi-page TIFF"])
+        dialog.set_choice("format", "png")
+        
+        def on_response(d, response):
+            if response == Gtk.ResponseType.ACCEPT:
+                folder = d.get_file()
+                from pdf_app.document.raster_export import export_page_images
+                snapshot = view.store.snapshot()
+                pdf_path = view.file.get_path()
+                try:
+                    dpi = int(d.get_choice("dpi") or 150)
+                except ValueError:
+                    dpi = 150
+                tiff_path = None
+                if d.get_choice("format") == "tiff":
+                    stem = os.path.splitext(view.file.get_basename())[0]
+                    tiff_path = os.path.join(folder.get_path(), stem + ".tiff")
+                
+                def on_done(paths):
+                    self.job_bar.finish()
+                    if paths and tiff_path:
+                        toast = Adw.Toast.new(f"Exported {os.path.basename(tiff_path)}")
+                    elif paths:
+                        toast = Adw.Toast.new(f"Exported {len(paths)} pages to {folder.get_basename()}")
+                    elif job.cancelled:
+                        toast = Adw.Toast.new("Export Cancelled")
+                    else:
+                        toast = Adw.Toast.new("No annotated pages to export")
                     self.toolbar_view.add_toast(toast)
+                
+                def on_error(e):
+                    self.job_bar.finish()
+                    print(f"Image export failed: {e}")
+                    self.toolbar_view.add_toast(Adw.Toast.new(f"Export Failed: {e}"))
+                
+                job = BackgroundJob(
+                    lambda progress, cancel: export_page_images(
+                        pdf_path, snapshot, folder.get_path(), dpi=dpi,
+                        tiff_path=tiff_path, keep_pngs=tiff_path is None,
+                        progress=progress, cancel=cancel),
+                    on_progress=self.job_bar.update,
+                    on_done=on_done,
+                    on_error=on_error
+                )
+                self.job_bar.track(job, "Exporting page images")
+                job.start()
             d.destroy()
             
         dialog.connect("response", on_response)
         dialog.show()
 
+    def _after_fingerprint(self, pdf_path: str, title: str, then):
+        """
+        Hashes pdf_path on a worker thread (or waits there for the warm-up
+        hash), then calls then() on the main loop, where the project step
+        finds the fingerprint cached instead of blocking the UI.
+        """
+        from pdf_app.document import fingerprint
+        tracked = not self.job_bar.busy
+
+        def on_done(_):
+            if tracked:
+                self.job_bar.finish()
+            if job.cancelled:
+                self.toolbar_view.add_toast(Adw.Toast.new("Cancelled"))
+                return
+            then()
+
+        def on_error(e):
+            # save_to_file/load_from_file report a missing fingerprint themselves
+            if tracked:
+                self.job_bar.finish()
+            then()
+
+        job = BackgroundJob(
+            lambda progress, cancel: fingerprint.get_fingerprint(pdf_path),
+            on_done=on_done,
+            on_error=on_error
+        )
+        if tracked:
+            self.job_bar.track(job, title)
+        job.start()
+
     def on_save_project_as(self, action, param):
         """Save Project As (JSON)."""
         selected_page = self.tab_view.get_selected_page()
@@ -582,6 +859,12 @@ class MainWindow(Adw.ApplicationWindow):
         filter_json.add_pattern("*.json")
         dialog.add_filter(filter_json)
         
+        # Compact binary format, chosen by extension in save_to_file
+        filter_binary = Gtk.FileFilter()
+        filter_binary.set_name("Binary Project Files (*.pdfannot)")
+        filter_binary.add_pattern("*.pdfannot")
+        dialog.add_filter(filter_binary)
+        
         try:
             orig_name = view.file.get_basename()
             suggested = orig_name + ".json"
@@ -592,14 +875,19 @@ class MainWindow(Adw.ApplicationWindow):
             if response == Gtk.ResponseType.ACCEPT:
                 file = d.get_file()
                 path = file.get_path()
-                try:
-                    view.store.save_to_file(path, view.file.get_path())
-                    toast = Adw.Toast.new(f"Project saved to {file.get_basename()}")
-                    self.toolbar_view.add_toast(toast)
-                except Exception as e:
-                    print(f"Error: {e}")
-                    toast = Adw.Toast.new("Save Failed")
-                    self.toolbar_view.add_toast(toast)
+                pdf_path = view.file.get_path()
+                
+                def save():
+                    try:
+                        view.store.save_to_file(path, pdf_path)
+                        toast = Adw.Toast.new(f"Project saved to {file.get_basename()}")
+                        self.toolbar_view.add_toast(toast)
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        toast = Adw.Toast.new("Save Failed")
+                        self.toolbar_view.add_toast(toast)
+                
+                self._after_fingerprint(pdf_path, f"Saving {file.get_basename()}", save)
             d.destroy()
             
         dialog.connect("response", on_response)
@@ -619,29 +907,33 @@ class MainWindow(Adw.ApplicationWindow):
         )
         
         filter_json = Gtk.FileFilter()
-        filter_json.set_name("Project Files (*.json)")
+        filter_json.set_name("Project Files (*.json, *.pdfannot)")
         filter_json.add_pattern("*.json")
+        filter_json.add_pattern("*.pdfannot")
         dialog.add_filter(filter_json)
         
         def on_response(d, response):
             if response == Gtk.ResponseType.ACCEPT:
                 file = d.get_file()
                 path = file.get_path()
-                try:
-                    mismatch = view.store.load_from_file(path, view.file.get_path())
-                    if mismatch:
-                        toast = Adw.Toast.new("Warning: PDF Mismatch")
-                        self.toolbar_view.add_toast(toast)
-                    else:
-                        toast = Adw.Toast.new("Project Loaded")
-                        self.toolbar_view.add_toast(toast)
+                pdf_path = view.file.get_path()
+                
+                def load():
+                    try:
+                        mismatch = view.store.load_from_file(path, pdf_path, lazy=True)
+                        if mismatch:
+                            toast = Adw.Toast.new("Warning: PDF Mismatch")
+                            self.toolbar_view.add_toast(toast)
+                        else:
+                            toast = Adw.Toast.new("Project Loaded")
+                            self.toolbar_view.add_toast(toast)
                         
-                    view.reload_page(view.page_number)
-                    
-                except Exception as e:
-                    print(f"Error: {e}")
-                    toast = Adw.Toast.new("Load Failed")
-                    self.toolbar_view.add_toast(toast)
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        toast = Adw.Toast.new("Load Failed")
+                        self.toolbar_view.add_toast(toast)
+                
+                self._after_fingerprint(pdf_path, f"Opening {file.get_basename()}", load)
             d.destroy()
             
         dialog.connect("response", on_response)
@@ -689,6 +981,9 @@ class MainWindow(Adw.ApplicationWindow):
                     pass
             self.current_view_signals = None
 
+        view = page.get_child() if page else None
+        self.search_popover.set_view(view if isinstance(view, PDFView) else None)
+
         if not page:
             # Clear sidebar and HIDE it
             self.split_view.set_sidebar(self.sidebar_placeholder)
@@ -785,6 +1080,10 @@ class MainWindow(Adw.ApplicationWindow):
             # Show prompt for this single page
             self.prompt_save_changes([page], close_app=False)
             return True # Stop close
+        if hasattr(view, 'store'):
+            view.store.discard_recovery()
+        if isinstance(view, PDFView):
+            view.cancel_search_indexing()
         return False # Allow close
                 
     def on_close_request(self, win):
@@ -798,6 +1097,7 @@ class MainWindow(Adw.ApplicationWindow):
                 dirty_pages.append(page_wrapper)
         
         if not dirty_pages:
+            self.discard_recovery_logs()
             return False 
         
         self.prompt_save_changes(dirty_pages, close_app=True)
@@ -805,6 +1105,13 @@ class MainWindow(Adw.ApplicationWindow):
 
  
 
+    def discard_recovery_logs(self):
+        """Clean exit: drop recovery logs of every open document that saved cleanly."""
+        for i in range(self.tab_view.get_n_pages()):
+            view = self.tab_view.get_nth_page(i).get_child()
+            if hasattr(view, 'store') and not view.store.is_dirty:
+                view.store.discard_recovery()
+
     def prompt_save_changes(self, dirty_pages, close_app=True):
         count = len(dirty_pages)
         
@@ -861,7 +1168,13 @@ class MainWindow(Adw.ApplicationWindow):
         
         def on_response(dlg, resp):
             if resp == "discard":
+                for page in dirty_pages:
+                    view = page.get_child()
+                    if hasattr(view, 'store'):
+                        view.store.discard_recovery()
+                        
                 if close_app:
+                    self.discard_recovery_logs()
                     try: self.disconnect_by_func(self.on_close_request)
                     except: pass
                     self.close()
@@ -881,11 +1194,15 @@ class MainWindow(Adw.ApplicationWindow):
                             traceback.print_exc()
                 
                 if close_app:
+                    self.discard_recovery_logs()
                     try: self.disconnect_by_func(self.on_close_request)
                     except: pass
                     self.close()
                 else:
                     page = dirty_pages[0]
+                    store = page.get_child().store
+                    if not store.is_dirty:
+                        store.discard_recovery()
                     self.tab_view.close_page_finish(page, True)
             
             else: # Cancel